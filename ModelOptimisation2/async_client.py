@@ -0,0 +1,199 @@
+__all__ = ['AsyncObjectiveFunction']
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# default maximum number of concurrent requests to the server
+MAX_CONNECTIONS = 8
+
+
+class AsyncObjectiveFunction:
+    """asynchronous access to the ObjectiveFunction server
+
+    The calls of the blocking client are run in a bounded pool of
+    threads that is kept for the lifetime of the object, so that many
+    state transitions and result uploads can be in flight at the same
+    time. Each thread creates its own client whose connections are
+    reused for all requests made by the thread.
+
+    :param new_client: callable creating an objective function client
+    :param max_connections: the maximum number of concurrent requests
+    """
+
+    def __init__(self, new_client: Callable[[], Any],
+                 max_connections: int = MAX_CONNECTIONS):
+        """constructor"""
+        if max_connections < 1:
+            raise ValueError('need at least one connection')
+        self._new_client = new_client
+        self._clients = threading.local()
+        self._max_connections = max_connections
+        self._executor = None
+
+    @property
+    def objfun(self):
+        """the objective function client of the calling thread"""
+        client = getattr(self._clients, 'objfun', None)
+        if client is None:
+            client = self._new_client()
+            self._clients.objfun = client
+        return client
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_connections,
+                thread_name_prefix='objfun')
+        return self._executor
+
+    def close(self) -> None:
+        """shut down the pool of threads"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def run(self, coro):
+        """run a coroutine to completion from blocking code
+
+        :param coro: the coroutine, eg a call of a method of this object
+        """
+        return asyncio.run(coro)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _invoke(self, name, *args, **kwargs):
+        # runs in a worker thread using the client of the thread
+        func = self.objfun
+        if name is not None:
+            func = getattr(func, name)
+        return func(*args, **kwargs)
+
+    async def _call(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self._invoke, name, *args, **kwargs))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attr = getattr(self.objfun, name)
+        if not callable(attr):
+            return attr
+        return partial(self._call, name)
+
+    async def __call__(self, *args, **kwargs):
+        return await self._call(None, *args, **kwargs)
+
+    async def map(self, func: Callable, *iterables) -> List[Any]:
+        """call a function concurrently for many arguments
+
+        The function is called in the worker threads with the client of
+        the thread as first argument followed by the items of the
+        iterables. Each call is made by a single thread so that several
+        requests can be combined into one step.
+
+        :param func: the function
+        :param iterables: the iterables of arguments
+        :return: the list of results or exceptions raised by the calls
+        """
+        loop = asyncio.get_running_loop()
+
+        def call(*args):
+            return func(self.objfun, *args)
+
+        return await asyncio.gather(
+            *[loop.run_in_executor(self.executor, call, *args)
+              for args in zip(*iterables)],
+            return_exceptions=True)
+
+    async def claim(self, state, new_state,
+                    num_runs: Optional[int] = None) -> \
+            List[Tuple[int, Dict[str, Any]]]:
+        """move runs from one state to another
+
+        Runs are claimed concurrently in waves until num_runs runs
+        have been claimed or there are no more runs in the state. If a
+        request fails the runs claimed so far are moved back to their
+        original state before the error is raised.
+
+        :param state: the current state of the runs
+        :param new_state: the new state of the runs
+        :param num_runs: the maximum number of runs to claim,
+                         claim all runs if None
+        :return: a list of run ID, parameter tuples
+        """
+        runs: List[Tuple[int, Dict[str, Any]]] = []
+        while num_runs is None or len(runs) < num_runs:
+            n = self.max_connections
+            if num_runs is not None:
+                n = min(n, num_runs - len(runs))
+            results = await asyncio.gather(
+                *[self.get_with_state(state, with_id=True,
+                                      new_state=new_state)
+                  for i in range(n)],
+                return_exceptions=True)
+            exhausted = False
+            error = None
+            for result in results:
+                if isinstance(result, LookupError):
+                    exhausted = True
+                elif isinstance(result, BaseException):
+                    error = result
+                else:
+                    runs.append(result)
+            if error is not None:
+                await self._release(runs, state)
+                raise error
+            if exhausted:
+                break
+        return runs
+
+    async def _release(self, runs, state):
+        results = await asyncio.gather(
+            *[self.setState(runid, state) for runid, params in runs],
+            return_exceptions=True)
+        for (runid, params), result in zip(runs, results):
+            if isinstance(result, BaseException):
+                logging.error(f'could not move run {runid} back to state '
+                              f'{getattr(state, "name", state)}: {result}')
+
+    async def get_states(self, runids: List[int]) -> Dict[int, Any]:
+        """get the states of many runs
+
+        :param runids: the IDs of the runs
+        :return: dictionary mapping run IDs to states, the state of
+                 unknown runs is None
+        """
+        states = await asyncio.gather(*[self.getState(runid)
+                                        for runid in runids],
+                                      return_exceptions=True)
+        result = {}
+        for runid, state in zip(runids, states):
+            if isinstance(state, LookupError):
+                state = None
+            elif isinstance(state, BaseException):
+                raise state
+            result[runid] = state
+        return result
+
+    async def set_states(self, runids: List[int], state) -> None:
+        """change the state of many runs
+
+        :param runids: the IDs of the runs
+        :param state: the new state
+        """
+        await asyncio.gather(*[self.setState(runid, state)
+                               for runid in runids])
@@ -0,0 +1,158 @@
+__all__ = ['ResultCache']
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+import numpy
+
+
+class ResultCache:
+    """local cache of completed objective function evaluations
+
+    Completed evaluations never change so they can be kept locally. The
+    results are stored in a SQLite database keyed by the parameter
+    values rounded to a number of significant digits. All results are
+    read from the database when the cache is opened. If a neighbour
+    index is given parameter values that are not in the cache get the
+    result of the nearest cached parameter values within the tolerance
+    of the index. Runs pruned by mo2-monitor have no result on the
+    server. Their penalty is recorded separately and never cached as a
+    result.
+
+    :param fname: the name of the database file
+    :type fname: Path
+    :param digits: the number of significant digits used for the key
+    :type digits: int
+    :param index: index used to find nearby parameter values
+    :type index: NeighbourIndex
+    """
+
+    def __init__(self, fname: Path, digits: int = 12, index=None):
+        """constructor"""
+        self._fname = Path(fname)
+        self._digits = digits
+        self._index = index
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self._fname), timeout=60,
+                                   check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                             '(key TEXT PRIMARY KEY, x TEXT, obs TEXT)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS pruned '
+                             '(key TEXT PRIMARY KEY, obs TEXT)')
+        self._results = {}
+        self._rowid = 0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """read the results added to the database by other processes"""
+        with self._lock:
+            rows = self._db.execute('SELECT rowid, key, x, obs FROM results '
+                                    'WHERE rowid > ? ORDER BY rowid',
+                                    (self._rowid,)).fetchall()
+            for rowid, key, x, obs in rows:
+                result = (numpy.array(json.loads(x)),
+                          numpy.array(json.loads(obs)))
+                if key not in self._results and self._index is not None:
+                    self._index.add(result[0], result)
+                self._results[key] = result
+                self._rowid = rowid
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, x):
+        return self._lookup(x) is not None
+
+    def _lookup(self, x):
+        result = self._results.get(self.key(x))
+        if result is None and self._index is not None:
+            with self._lock:
+                nearest = self._index.nearest(x)
+            if nearest is not None:
+                result = nearest[1]
+        return result
+
+    @property
+    def fname(self) -> Path:
+        """the name of the database file"""
+        return self._fname
+
+    def key(self, x) -> str:
+        """the key for parameter values x"""
+        return ','.join(f'{v:.{self._digits}g}'
+                        for v in numpy.asarray(x, dtype=float))
+
+    def items(self):
+        """iterate over all cached parameter values and results"""
+        return self._results.values()
+
+    def get(self, x) -> Optional[numpy.ndarray]:
+        """get the result for parameter values x
+
+        :param x: the parameter values
+        :return: the cached result or None
+        """
+        result = self._lookup(x)
+        if result is not None:
+            if self.key(result[0]) != self.key(x):
+                logging.info(f'reusing result of {result[0]} for {x}')
+            return result[1]
+
+    def pruned(self, x) -> bool:
+        """whether the run with parameter values x was pruned
+
+        :param x: the parameter values
+        """
+        return self.penalty(x) is not None
+
+    def penalty(self, x) -> Optional[numpy.ndarray]:
+        """get the penalty of a pruned run
+
+        :param x: the parameter values
+        :return: the penalty or None if the run was not pruned
+        """
+        # runs are pruned by another process
+        with self._lock:
+            row = self._db.execute('SELECT obs FROM pruned WHERE key = ?',
+                                   (self.key(x),)).fetchone()
+        if row is not None:
+            return numpy.array(json.loads(row[0]))
+
+    def prune(self, x, obs) -> None:
+        """mark the run with parameter values x as pruned
+
+        :param x: the parameter values
+        :param obs: the penalty given to the optimiser instead of the
+                    result of the run
+        """
+        key = self.key(x)
+        obs = numpy.asarray(obs, dtype=float)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR IGNORE INTO pruned VALUES (?, ?)',
+                             (key, json.dumps(obs.tolist())))
+
+    def set(self, x, obs) -> None:
+        """store the result for parameter values x
+
+        The results of pruned runs are ignored.
+
+        :param x: the parameter values
+        :param obs: the objective function values
+        """
+        x = numpy.asarray(x, dtype=float)
+        obs = numpy.asarray(obs, dtype=float)
+        if self.pruned(x):
+            return
+        key = self.key(x)
+        with self._lock:
+            if key not in self._results and self._index is not None:
+                self._index.add(x, (x, obs))
+            self._results[key] = (x, obs)
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                    (key, json.dumps(x.tolist()), json.dumps(obs.tolist())))
@@ -0,0 +1,119 @@
+__all__ = ['Checkpoint']
+
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+import numpy
+
+
+class Checkpoint:
+    """ordered log of the evaluations requested by the optimiser
+
+    The optimiser is restarted from scratch on every invocation and
+    requests the same sequence of parameter sets as before. The log
+    answers these requests locally. If the optimiser requests a
+    different parameter set the remainder of the log is discarded.
+
+    :param fname: the name of the checkpoint file
+    :type fname: Path
+    """
+
+    def __init__(self, fname: Path):
+        """constructor"""
+        self._fname = Path(fname)
+        self._evals = []
+        self._pos = 0
+
+        if self._fname.exists():
+            with self._fname.open() as cp:
+                for line in cp:
+                    x, obs = json.loads(line)
+                    self._evals.append((numpy.array(x), numpy.array(obs)))
+
+    def __len__(self):
+        return len(self._evals)
+
+    @property
+    def fname(self) -> Path:
+        """the name of the checkpoint file"""
+        return self._fname
+
+    def rewind(self) -> None:
+        """start a new replay of the optimiser"""
+        self._pos = 0
+
+    def lookup(self, x) -> Optional[numpy.ndarray]:
+        """get the next evaluation from the log
+
+        :param x: the parameter values requested by the optimiser
+        :return: the objective function values or None if x is not
+                 the next parameter set in the log
+        """
+        if self._pos >= len(self._evals):
+            return None
+        logged_x, obs = self._evals[self._pos]
+        if not numpy.array_equal(logged_x, x):
+            logging.info(f'optimiser diverged from checkpoint after '
+                         f'{self._pos} evaluations')
+            self._truncate(self._pos)
+            return None
+        self._pos += 1
+        return obs
+
+    def record(self, x, obs) -> None:
+        """append an evaluation to the log
+
+        :param x: the parameter values
+        :param obs: the objective function values
+        """
+        x = numpy.asarray(x, dtype=float)
+        obs = numpy.asarray(obs, dtype=float)
+        if self._pos < len(self._evals):
+            self._truncate(self._pos)
+        self._evals.append((x, obs))
+        self._pos += 1
+        with self._fname.open('a') as cp:
+            cp.write(json.dumps([x.tolist(), obs.tolist()]) + '\n')
+
+    def clear(self) -> None:
+        """discard all logged evaluations"""
+        self._truncate(0)
+        self._pos = 0
+
+    def verify(self, lookup) -> bool:
+        """check all logged evaluations against stored results
+
+        The log is discarded if the values of any evaluation do not
+        match or an evaluation is unknown.
+
+        :param lookup: callable returning the stored objective function
+                       values of parameter values. It returns None if
+                       the values cannot be checked and raises a
+                       LookupError if there is no such evaluation.
+        :return: True if the checkpoint is consistent
+        """
+        consistent = True
+        for x, obs in self._evals:
+            try:
+                stored = lookup(x)
+            except LookupError as e:
+                logging.debug(f'checkpoint lookup failed: {e}')
+                consistent = False
+                break
+            if stored is not None and not numpy.allclose(stored, obs):
+                consistent = False
+                break
+        if not consistent:
+            logging.warning(f'checkpoint {self._fname} is inconsistent '
+                            'with the stored results, discarding it')
+            self.clear()
+        return consistent
+
+    def _truncate(self, num_evals):
+        self._evals = self._evals[:num_evals]
+        tmp = self._fname.with_suffix('.tmp')
+        with tmp.open('w') as cp:
+            for x, obs in self._evals:
+                cp.write(json.dumps([x.tolist(), obs.tolist()]) + '\n')
+        tmp.replace(self._fname)
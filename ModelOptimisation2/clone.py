@@ -0,0 +1,83 @@
+__all__ = ['CLONE_MODES', 'clone_model']
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable
+
+CLONE_MODES = ['copy', 'hardlink', 'symlink', 'reflink']
+
+# ioctl request to clone a file on copy-on-write filesystems
+FICLONE = 0x40049409
+
+
+def _hardlink(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # eg across filesystems
+        shutil.copy2(src, dst)
+
+
+def _symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+        with open(src, 'rb') as infile, open(dst, 'wb') as outfile:
+            fcntl.ioctl(outfile.fileno(), FICLONE, infile.fileno())
+    except (ImportError, OSError):
+        # the filesystem does not support reflinks
+        shutil.copy2(src, dst)
+    else:
+        shutil.copystat(src, dst)
+
+
+_COPY_FUNCTIONS = {'copy': shutil.copy2,
+                   'hardlink': _hardlink,
+                   'symlink': _symlink,
+                   'reflink': _reflink}
+
+
+def clone_model(clonedir: Path, modeldir: Path, mode: str = 'copy',
+                materialise: Iterable[Path] = ()) -> None:
+    """clone a model setup
+
+    The directory tree is always created. How files are cloned depends
+    on the mode:
+
+    copy
+      copy all files
+    hardlink
+      hard link files, falls back to copying across filesystems
+    symlink
+      create symbolic links pointing to the files in the clone directory
+    reflink
+      clone files on copy-on-write filesystems, falls back to copying
+
+    Files that get modified, ie the files listed in materialise, are
+    always copied. Files shared with the clone directory must not be
+    modified in place.
+
+    :param clonedir: the directory to clone
+    :param modeldir: the target directory
+    :param mode: the clone mode, one of CLONE_MODES
+    :param materialise: the files relative to clonedir that are copied
+    """
+    if mode not in _COPY_FUNCTIONS:
+        raise ValueError(f'unknown clone mode {mode}')
+    clonedir = Path(clonedir)
+    materialise = {Path(f) for f in materialise}
+    clone_function = _COPY_FUNCTIONS[mode]
+
+    def copy_function(src, dst):
+        if Path(src).relative_to(clonedir) in materialise:
+            return shutil.copy2(src, dst)
+        return clone_function(src, dst)
+
+    logging.debug(f'cloning {clonedir} to {modeldir} using {mode}')
+    shutil.copytree(clonedir, modeldir, copy_function=copy_function,
+                    dirs_exist_ok=True)
@@ -1,17 +1,93 @@
 __all__ = ['MODELS', 'ModelOptimisationConfig']
 
+from collections.abc import Mapping
+from contextlib import contextmanager
+import copy
+import importlib
+import json
 from pathlib import Path
+import sys
+import threading
+from typing import Dict, Optional
 
 import ObjectiveFunction_client
-from .config_dummy import DummyModel
-from .config_UKESM import UKESM
-from .config_MITgcm import MITgcm
-from .config_HadCM3 import HadCM3
 
-MODELS = {'DummyModel': DummyModel,
-          'UKESM': UKESM,
-          'MITgcm': MITgcm,
-          'HadCM3': HadCM3}
+from .instrument import Instrument, TimedObjectiveFunction
+from .instrument import profiling_enabled
+
+
+# entry point group used by packages providing additional models
+MODELS_GROUP = 'ModelOptimisation2.models'
+
+
+class ModelRegistry(Mapping):
+    """a mapping of model names to model classes
+
+    The model classes are only imported when they are first looked up.
+    Additional models are discovered from the entry points of the
+    group, eg in setup.py::
+
+      entry_points={
+          'ModelOptimisation2.models': [
+              'MyModel = mypackage.mymodel:MyModel',
+          ],
+      }
+
+    :param models: dictionary mapping model names to the location of the
+                   model class in the form module:class
+    :param group: the name of the entry point group
+    """
+
+    def __init__(self, models: Dict[str, str], group: Optional[str] = None):
+        """constructor"""
+        self._locations = dict(models)
+        self._group = group
+        self._discovered = group is None
+        self._models = {}
+
+    def _discover(self):
+        # looking up entry points scans all installed packages, only do
+        # it once and only when a model is not built in
+        if self._discovered:
+            return
+        self._discovered = True
+        from importlib.metadata import entry_points
+        eps = entry_points()
+        if hasattr(eps, 'select'):
+            eps = eps.select(group=self._group)
+        else:
+            eps = eps.get(self._group, [])
+        for ep in eps:
+            if ep.name not in self._locations:
+                self._locations[ep.name] = ep
+
+    def __getitem__(self, name):
+        if name not in self._models:
+            if name not in self._locations:
+                self._discover()
+            location = self._locations[name]
+            if isinstance(location, str):
+                module, cls = location.split(':')
+                module = importlib.import_module(module, __package__)
+                self._models[name] = getattr(module, cls)
+            else:
+                self._models[name] = location.load()
+        return self._models[name]
+
+    def __iter__(self):
+        self._discover()
+        return iter(self._locations)
+
+    def __len__(self):
+        self._discover()
+        return len(self._locations)
+
+
+MODELS = ModelRegistry({'DummyModel': '.config_dummy:DummyModel',
+                        'UKESM': '.config_UKESM:UKESM',
+                        'MITgcm': '.config_MITgcm:MITgcm',
+                        'HadCM3': '.config_HadCM3:HadCM3'},
+                       group=MODELS_GROUP)
 
 
 class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
@@ -25,6 +101,15 @@ class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
       basedir = string() # the base directory
       model = string(default=DummyModel)
       clone = string(default=None)
+      # how to clone the model setup: copy, hardlink, symlink or reflink
+      clone_mode = option(copy, hardlink, symlink, reflink, default=copy)
+      # record timings of the run lifecycle in the profile directory
+      profile = boolean(default=False)
+      # the maximum number of concurrent requests to the server
+      connections = integer(min=1, default=8)
+      # reuse the result of parameter values closer than the tolerance
+      # relative to the bounds, 0 only reuses identical parameter values
+      tolerance = float(min=0, default=0)
     """
 
     modeloptCfgStr = """
@@ -33,12 +118,22 @@ class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
     """
 
     RUNID = Path('objfun.runid')
+    RESULTS = Path('results.sqlite')
+    NOTIFY = Path('objfun.notify')
+    PROFILE = Path('profile')
+    PARAMS = Path('objfun.params')
+    PRUNED = Path('objfun.pruned')
+    LOCK = Path('objfun.lock')
 
     def __init__(self, fname: Path) -> None:
         super().__init__(fname)
 
         self._scales = None
         self._model = None
+        self._resultCache = None
+        self._instrument = None
+        self._objectiveFunctionClients = None
+        self._asyncObjectiveFunction = None
 
     @property
     def defaultCfgStr(self):
@@ -65,6 +160,101 @@ class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
         if self.cfg['setup']['clone'] is not None:
             return self.expand_path(self.cfg['setup']['clone'])
 
+    @property
+    def cloneMode(self):
+        return self.cfg['setup']['clone_mode']
+
+    @property
+    def tolerance(self):
+        return self.cfg['setup']['tolerance']
+
+    @property
+    def resultCache(self):
+        """local cache of completed evaluations"""
+        if self._resultCache is None:
+            # the cache pulls in numpy, only import it when needed
+            from .cache import ResultCache
+            index = None
+            if self.tolerance > 0:
+                from .neighbours import NeighbourIndex
+                index = NeighbourIndex(self.objectiveFunction.lower_bounds,
+                                       self.objectiveFunction.upper_bounds,
+                                       self.tolerance)
+            self._resultCache = ResultCache(self.basedir / self.RESULTS,
+                                            index=index)
+        return self._resultCache
+
+    @property
+    def profiling(self):
+        """whether instrumentation is enabled
+
+        The environment variable MO2_PROFILE overrides the configuration.
+        """
+        return profiling_enabled(self.cfg['setup']['profile'])
+
+    @property
+    def instrument(self):
+        """timers for the run lifecycle"""
+        if self._instrument is None:
+            self._instrument = Instrument(self.basedir / self.PROFILE,
+                                          enabled=self.profiling)
+        return self._instrument
+
+    def newObjectiveFunction(self):
+        """create a new objective function client
+
+        The base configuration may cache the client it creates. The
+        client is therefore built by the base configuration of a fresh
+        copy of this configuration, so that no two calls share a client.
+        """
+        objfun = super(ModelOptimisationConfig,
+                       copy.copy(self)).objectiveFunction
+        if self.instrument.enabled:
+            objfun = TimedObjectiveFunction(objfun, self.instrument)
+        return objfun
+
+    @property
+    def objectiveFunction(self):
+        """the objective function client of the calling thread
+
+        A client is created once for each thread so that its connections
+        to the server are reused for all requests of the thread without
+        sharing the client between threads.
+        """
+        if self._objectiveFunctionClients is None:
+            self._objectiveFunctionClients = threading.local()
+        client = getattr(self._objectiveFunctionClients, 'client', None)
+        if client is None:
+            client = self.newObjectiveFunction()
+            self._objectiveFunctionClients.client = client
+        return client
+
+    @property
+    def serverConnections(self):
+        return self.cfg['setup']['connections']
+
+    @property
+    def asyncObjectiveFunction(self):
+        """asynchronous access to the objective function"""
+        if self._asyncObjectiveFunction is None:
+            # only import asyncio when needed
+            from .async_client import AsyncObjectiveFunction
+            self._asyncObjectiveFunction = AsyncObjectiveFunction(
+                self.newObjectiveFunction,
+                max_connections=self.serverConnections)
+        return self._asyncObjectiveFunction
+
+    def notifyResult(self):
+        """signal waiting processes that a new result is available"""
+        (self.basedir / self.NOTIFY).touch()
+
+    def resultStamp(self):
+        """the time the last result was signalled"""
+        try:
+            return (self.basedir / self.NOTIFY).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
     def modelDir(self, runID, create=False):
         if runID is None:
             cdir = Path('default')
@@ -89,6 +279,40 @@ class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
                 raise RuntimeError('run ID does not match')
         return modeldir
 
+    @contextmanager
+    def lockRun(self, runID):
+        """hold the lock of a run while changing its state
+
+        The job of a run and mo2-monitor both change the state of an
+        active run. The lock is a file in the model directory so it is
+        shared by processes on all hosts.
+
+        :param runID: the ID of the run
+        """
+        # fcntl is only available on POSIX systems
+        import fcntl
+        with open(self.modelDir(runID) / self.LOCK, 'a') as lock:
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock, fcntl.LOCK_UN)
+
+    def writeRunParams(self, runID, params):
+        """store the parameters of a run in its model directory
+
+        :param runID: the ID of the run
+        :param params: a dictionary containing parameter names and values
+        """
+        (self.modelDir(runID) / self.PARAMS).write_text(json.dumps(params))
+
+    def runParams(self, runID):
+        """the parameters of a run stored in its model directory
+
+        :param runID: the ID of the run
+        """
+        return json.loads((self.modelDir(runID) / self.PARAMS).read_text())
+
     @property
     def model(self):
         if self._model is None:
@@ -97,7 +321,6 @@ class ModelOptimisationConfig(ObjectiveFunction_client.ObjFunConfig):
 
 
 if __name__ == '__main__':
-    import sys
     from pprint import pprint
     config = ModelOptimisationConfig(Path(sys.argv[1]))
     pprint(config.cfg)
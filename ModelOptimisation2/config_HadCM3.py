@@ -1,9 +1,9 @@
 import math
 import numpy
-from scipy.interpolate import interp1d
 
 from .model import NMLValue, BaseNamelistValue, SimpleNamelistValue
 from .model import RepeatedNamelistValue, InterpolatedValue, NamelistModel
+from .model import PiecewiseLinear
 
 
 class SphIce(BaseNamelistValue):
@@ -33,6 +33,10 @@ class RunName(BaseNamelistValue):
     def __init__(self):
         super().__init__('CNTLALL', 'NLSTCALL')
 
+    @property
+    def nmlfiles(self):
+        return super().nmlfiles + ['CONTCNTL', 'INITHIS']
+
     def __call__(self, value):
         return [self._get_nmlval('EXPT_ID', value[:4]),
                 self._get_nmlval('JOB_ID', value[4]),
@@ -56,14 +60,20 @@ class CloudRHcrit(SimpleNamelistValue):
         rhcrit[2] = max(0.85, value)
         return super().__call__(rhcrit)
 
+    def many(self, values):
+        values = numpy.asarray(values, dtype=float)
+        rhcrit = numpy.repeat(values[:, None], self._num_levels, axis=1)
+        rhcrit[:, 0] = numpy.maximum(0.95, values)
+        rhcrit[:, 1] = numpy.maximum(0.9, values)
+        rhcrit[:, 2] = numpy.maximum(0.85, values)
+        return super().many(rhcrit.tolist())
+
 
 class CloudEACF(SimpleNamelistValue):
     def __init__(self, num_levels):
         super().__init__('CNTLATM', 'SLBC21', 'EACF')
         self._num_levels = num_levels
-        self._interp = interp1d([0.5, 0.7, 0.8], [0.5, 0.6, 0.65],
-                                kind='linear', bounds_error=True,
-                                assume_sorted=True)
+        self._interp = PiecewiseLinear([0.5, 0.7, 0.8], [0.5, 0.6, 0.65])
 
     def __call__(self, value):
         if value < 0.5:
@@ -75,6 +85,18 @@ class CloudEACF(SimpleNamelistValue):
         cloud_eacf[6] = (value + 2. * eacf1) / 3.
         return super().__call__(cloud_eacf)
 
+    def many(self, values):
+        values = numpy.asarray(values, dtype=float)
+        if numpy.any(values < 0.5):
+            raise ValueError(
+                f'values must be ge 0.5, but got {values.min()}')
+        eacf1 = self._interp(values)
+        cloud_eacf = numpy.repeat(eacf1[:, None], self._num_levels, axis=1)
+        cloud_eacf[:, 0:5] = values[:, None]
+        cloud_eacf[:, 5] = (2. * values + eacf1) / 3.
+        cloud_eacf[:, 6] = (values + 2. * eacf1) / 3.
+        return super().many(cloud_eacf.tolist())
+
 
 class Diffusion(BaseNamelistValue):
     def __init__(self, num_levels, dlat=2.5, radius=6.37123e06,
@@ -111,6 +133,31 @@ class Diffusion(BaseNamelistValue):
                 self._get_nmlval('DIFF_EXP', diff_exp),
                 self._get_nmlval('DIFF_EXP_Q', diff_exp_q)]
 
+    def many(self, values):
+        dampn = numpy.asarray(values, dtype=float) * 3600. / self._timestep
+        en = 1 - numpy.exp(-1. / dampn)
+        endt = en / self._timestep
+        diffval = self._d2q * endt ** (1 / (0.5 * self._diff_pwr))
+        tmp = self._diff_pwr / 2  # integral
+        shape = (len(diffval), self._num_levels)
+
+        diff_coeff = numpy.repeat(diffval[:, None], self._num_levels, axis=1)
+        diff_coeff[:, -1] = 4e06
+        diff_coeff_q = numpy.repeat(diffval[:, None], self._num_levels,
+                                    axis=1)
+        diff_coeff_q[:, 13:-1] = 1.5e08
+        diff_coeff_q[:, -1] = 4e06
+        diff_exp = numpy.full(shape, tmp)
+        diff_exp[:, -1] = 1
+        diff_exp_q = numpy.full(shape, tmp)
+        diff_exp_q[:, 13:-1] = 2
+        diff_exp_q[:, -1] = 1
+
+        return [self._get_nmlval('DIFF_COEFF', list(diff_coeff)),
+                self._get_nmlval('DIFF_COEFF_Q', list(diff_coeff_q)),
+                self._get_nmlval('DIFF_EXP', list(diff_exp)),
+                self._get_nmlval('DIFF_EXP_Q', list(diff_exp_q))]
+
 
 class HadCM3(NamelistModel):
     NAMELIST_MAP = {
@@ -2,51 +2,60 @@ __all__ = ['UKESM']
 
 import logging
 from typing import Any, Dict
-import re
 
 from .model import SimpleNamelistValue, NamelistModel
 
 
+def _format_value(sct, key, value):
+    if isinstance(value, bool):
+        if value:
+            return '.true.'
+        else:
+            return '.false.'
+    elif isinstance(value, (int, float)):
+        return str(value)
+    else:
+        raise TypeError(f'cannot handle value for {sct}[{key}]')
+
+
+def _index_parameters(parameters):
+    # map section headers to the formatted values of the keys to replace
+    index = {}
+    for sct in parameters:
+        index[f'[namelist:{sct}]'] = {
+            key: _format_value(sct, key, parameters[sct][key])
+            for key in parameters[sct]}
+    return index
+
+
+def _edit_lines(lines, parameters):
+    # replace parameters in selected sections in a single pass over
+    # the lines of the configuration
+    index = _index_parameters(parameters)
+    keys = None
+    for line in lines:
+        if line.startswith('['):
+            # only the first occurrence of a section is edited
+            keys = index.pop(line.rstrip(), None)
+        elif keys:
+            key, sep, value = line.partition('=')
+            if sep and key in keys:
+                # found the parameter
+                newline = line[len(line.rstrip('\r\n')):]
+                line = f'{key}={keys.pop(key)}{newline}'
+        yield line
+
+
 def _process_config(config, parameters):
     # process configuration by replacing parameters in selected
     # sections
-    for sct in parameters:
-        # find the start of the section
-        section_start = config.find(f'[namelist:{sct}]')
-        if section_start > -1:
-            # found the section
-            section_end = config.find('[', section_start + 1)
-            if section_end == -1:
-                section_end = None
-
-            section = config[section_start:section_end]
-            # only deal with the single section
-            for key in parameters[sct]:
-                param = re.search(f'^{key}=(.*)$', section, flags=re.M)
-                if param is not None:
-                    # found the parameter
-                    if isinstance(parameters[sct][key], bool):
-                        if parameters[sct][key]:
-                            newval = '.true.'
-                        else:
-                            newval = '.false.'
-                    elif isinstance(parameters[sct][key], (int, float)):
-                        newval = str(parameters[sct][key])
-                    else:
-                        raise TypeError(
-                            f'cannot handle value for {sct}[{key}]')
-                    section = section[:param.start(1)]\
-                        + newval\
-                        + section[param.end(1):]
-
-            # reassemble configuration string
-            if section_end is not None:
-                config = config[:section_start] + section\
-                    + config[section_end:]
-            else:
-                config = config[:section_start] + section
+    return ''.join(_edit_lines(config.splitlines(keepends=True),
+                               parameters))
+
 
-    return config
+def _process_config_stream(infile, outfile, parameters):
+    # process configuration line by line from infile to outfile
+    outfile.writelines(_edit_lines(infile, parameters))
 
 
 class UKESM(NamelistModel):
@@ -71,11 +80,13 @@ class UKESM(NamelistModel):
         for cfg in output:
             cfgname = self.directory / cfg
             if cfgname.exists():
-                config = _process_config(cfgname.read_text(), output[cfg])
+                # check values before touching any files
+                _index_parameters(output[cfg])
                 # create a backup
                 old = cfgname.with_suffix('.conf~')
                 cfgname.replace(old)
-                # and write the new configuration
-                cfgname.write_text(config)
+                # and stream the new configuration
+                with old.open() as infile, cfgname.open('w') as outfile:
+                    _process_config_stream(infile, outfile, output[cfg])
             else:
                 logging.warning(f'no configuration file {cfgname}')
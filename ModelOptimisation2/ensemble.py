@@ -0,0 +1,202 @@
+import argparse
+import logging
+from pathlib import Path
+import numpy
+import sys
+import ObjectiveFunction_client
+
+from .config import ModelOptimisationConfig
+from .clone import CLONE_MODES
+from .model_config import claim_new_runs, configure_batch, _clone_setup
+
+DESIGNS = ['lhs', 'sobol', 'grid']
+
+# the maximum number of members of a grid design
+MAX_GRID = 100000
+
+
+def latin_hypercube(num_members, num_params, rng):
+    """a Latin hypercube design in the unit cube
+
+    :param num_members: the number of ensemble members
+    :param num_params: the number of parameters
+    :param rng: the random number generator
+    :return: array of shape (num_members, num_params)
+    """
+    strata = numpy.tile(numpy.arange(num_members), (num_params, 1)).T
+    strata = rng.permuted(strata, axis=0)
+    return (strata + rng.random((num_members, num_params))) / num_members
+
+
+def sobol(num_members, num_params, rng):
+    """a scrambled Sobol design in the unit cube
+
+    :param num_members: the number of ensemble members, ideally a power
+                        of 2
+    :param num_params: the number of parameters
+    :param rng: the random number generator
+    :return: array of shape (num_members, num_params)
+    """
+    # scipy is slow to import, only import it when needed
+    from scipy.stats import qmc
+    return qmc.Sobol(num_params, scramble=True, seed=rng).random(num_members)
+
+
+def grid(num_levels, num_params, rng=None):
+    """a full factorial grid in the unit cube
+
+    :param num_levels: the number of levels along each parameter
+    :param num_params: the number of parameters
+    :return: array of shape (num_levels**num_params, num_params)
+    """
+    levels = numpy.linspace(0., 1., num_levels)
+    return numpy.stack(numpy.meshgrid(*[levels] * num_params,
+                                      indexing='ij'),
+                       axis=-1).reshape(-1, num_params)
+
+
+def make_design(method, num, lower, upper, seed=None):
+    """a space filling design within the bounds
+
+    :param method: the design method, one of lhs, sobol or grid
+    :param num: the number of ensemble members or the number of levels
+                for a grid
+    :param lower: the lower bounds
+    :param upper: the upper bounds
+    :param seed: seed of the random number generator
+    :return: array of shape (number of members, number of parameters)
+    """
+    lower = numpy.asarray(lower, dtype=float)
+    upper = numpy.asarray(upper, dtype=float)
+    if num < 1:
+        raise ValueError('need at least one ensemble member')
+    if method == 'lhs':
+        make = latin_hypercube
+    elif method == 'sobol':
+        make = sobol
+    elif method == 'grid':
+        if num ** len(lower) > MAX_GRID:
+            raise ValueError(f'grid with {num}**{len(lower)} members '
+                             'is too large')
+        make = grid
+    else:
+        raise ValueError(f'unknown design {method}')
+    points = make(num, len(lower), numpy.random.default_rng(seed))
+    return lower + points * (upper - lower)
+
+
+def _register_point(objfun, x):
+    # a preliminary run is confirmed by a second request
+    for attempt in range(2):
+        try:
+            objfun(x)
+        except ObjectiveFunction_client.PreliminaryRun:
+            continue
+        except ObjectiveFunction_client.NewRun:
+            return True
+        except ObjectiveFunction_client.Waiting:
+            pass
+        return False
+    raise RuntimeError('the run is still preliminary')
+
+
+async def _register(objfun, points):
+    results = []
+    for start in range(0, len(points), objfun.max_connections):
+        results.extend(await objfun.map(
+            _register_point, points[start:start + objfun.max_connections]))
+    return results
+
+
+def register(config, points):
+    """create runs for all ensemble members
+
+    The members are registered concurrently in waves of as many
+    members as there are connections to the server.
+
+    :param config: the model optimisation configuration
+    :param points: array of parameter values of the members
+    :return: list of flags indicating new runs and dictionary mapping
+             the indices of members that could not be registered to the
+             error
+    """
+    objfun = config.asyncObjectiveFunction
+    results = objfun.run(_register(objfun, points))
+    new = []
+    failed = {}
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            failed[i] = result
+            result = False
+        new.append(result)
+    return new, failed
+
+
+def _main_configure(args, config, clonedir, clone_mode, num_new):
+    runs = claim_new_runs(config, num_new)
+    modeldirs, failed = configure_batch(config, clonedir, clone_mode,
+                                        runs, workers=args.workers)
+    for modeldir in modeldirs:
+        print(modeldir)
+    return failed
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', type=Path,
+                        help="name of configuration file")
+    parser.add_argument('-d', '--design', choices=DESIGNS, default='lhs',
+                        help="the design of the ensemble, default lhs")
+    parser.add_argument('-n', '--num-members', type=int, default=10,
+                        metavar='N',
+                        help="number of ensemble members or number of "
+                        "levels per parameter for a grid, default 10")
+    parser.add_argument('-s', '--seed', type=int,
+                        help="seed of the random number generator")
+    parser.add_argument('-o', '--output', type=Path,
+                        help="save the design to a text file")
+    parser.add_argument('-c', '--configure', action='store_true',
+                        default=False,
+                        help="configure the runs of the new members")
+    parser.add_argument('-C', '--clone',
+                        help="model setup to clone")
+    parser.add_argument('-m', '--clone-mode', choices=CLONE_MODES,
+                        help="how to clone the model setup, "
+                        "overrides the configuration")
+    parser.add_argument('-w', '--workers', type=int, metavar='K',
+                        help="number of runs to configure concurrently")
+    args = parser.parse_args()
+
+    config = ModelOptimisationConfig(args.config)
+    if args.configure:
+        clonedir, clone_mode = _clone_setup(parser, args, config)
+
+    try:
+        points = make_design(args.design, args.num_members,
+                             config.objectiveFunction.lower_bounds,
+                             config.objectiveFunction.upper_bounds,
+                             seed=args.seed)
+    except ValueError as e:
+        parser.error(e)
+    if args.output is not None:
+        numpy.savetxt(args.output, points)
+
+    new, failed = register(config, points)
+    num_new = sum(new)
+    logging.info(f'{num_new} of {len(points)} ensemble members are new')
+    for i in failed:
+        logging.error(f'could not register member {i} with parameters '
+                      f'{points[i].tolist()}: {failed[i]}')
+
+    if args.configure and num_new > 0:
+        if len(_main_configure(args, config, clonedir, clone_mode,
+                               num_new)) > 0:
+            sys.exit(1)
+    if len(failed) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+__all__ = ['Instrument', 'TimedObjectiveFunction']
+
+import argparse
+from contextlib import contextmanager
+from functools import partial
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+import ObjectiveFunction_client
+
+# environment variable used to switch instrumentation on or off,
+# overrides the configuration
+PROFILE_ENV = 'MO2_PROFILE'
+
+PERCENTILES = [50, 90, 99]
+
+# exceptions raised by the objective function that report the state of
+# a run rather than a failure
+OUTCOMES = (ObjectiveFunction_client.PreliminaryRun,
+            ObjectiveFunction_client.NewRun,
+            ObjectiveFunction_client.Waiting)
+
+
+def profiling_enabled(default: bool = False) -> bool:
+    """check whether instrumentation is enabled
+
+    :param default: the value used if the environment variable is not set
+    """
+    value = os.environ.get(PROFILE_ENV)
+    if value is None:
+        return default
+    return value.strip().lower() not in ['', '0', 'false', 'no', 'off']
+
+
+def _timed_call(instrument, phase, runid, func, *args, **kwargs):
+    with instrument.timer(phase, runid=runid):
+        return func(*args, **kwargs)
+
+
+class Instrument:
+    """record the time spent in the phases of the run lifecycle
+
+    Each timed phase is written as a JSON line to a file per run ID.
+    Phases that do not belong to a run are written to default.jsonl.
+
+    :param directory: the directory the records are written to
+    :param enabled: whether to record anything
+    """
+
+    def __init__(self, directory: Path, enabled: bool = True):
+        """constructor"""
+        self._directory = Path(directory)
+        self._enabled = enabled
+        self._command = Path(sys.argv[0]).name
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def records_name(self, runid: Optional[int]) -> Path:
+        """the name of the file containing the records of a run
+
+        :param runid: the ID of the run, None for records not
+                      belonging to a run
+        """
+        if runid is None:
+            return self.directory / 'default.jsonl'
+        return self.directory / f'run_{runid:04d}.jsonl'
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """append a record
+
+        :param record: dictionary containing at least the phase
+        """
+        record = dict(record, time=time.time(), command=self._command,
+                      pid=os.getpid())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # a single write of a short line in append mode so that
+        # concurrent processes do not interleave records
+        with self.records_name(record.get('runid')).open('a') as out:
+            out.write(json.dumps(record) + '\n')
+
+    @contextmanager
+    def timer(self, phase: str,
+              runid: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """time the enclosed block
+
+        The record is yielded so that the run ID can be filled in when
+        it only becomes known inside the block. The exceptions the
+        objective function raises for runs that are not completed are
+        recorded as the outcome of the block, other exceptions as
+        errors.
+
+        :param phase: the name of the phase
+        :param runid: the ID of the run
+        """
+        record = {'phase': phase, 'runid': runid}
+        if not self.enabled:
+            yield record
+            return
+        start = time.perf_counter()
+        try:
+            yield record
+        except OUTCOMES as e:
+            record['outcome'] = type(e).__name__
+            raise
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            record['duration'] = time.perf_counter() - start
+            self.write(record)
+
+    def wrap(self, func: Callable, phase: str,
+             runid: Optional[int] = None) -> Callable:
+        """time every call of a function
+
+        The returned callable can be pickled if the function can be
+        pickled so that it can be passed to a process pool.
+
+        :param func: the function to time
+        :param phase: the name of the phase
+        :param runid: the ID of the run
+        """
+        if not self.enabled:
+            return func
+        return partial(_timed_call, self, phase, runid, func)
+
+
+class TimedObjectiveFunction:
+    """time all calls to the ObjectiveFunction server
+
+    Attributes are passed through to the wrapped objective function,
+    methods are timed as phase server.<method>.
+
+    :param objfun: the objective function to time
+    :param instrument: the instrument used to record the calls
+    """
+
+    def __init__(self, objfun, instrument: Instrument):
+        """constructor"""
+        self._objfun = objfun
+        self._instrument = instrument
+
+    @property
+    def objfun(self):
+        return self._objfun
+
+    def _call(self, phase, func, *args, **kwargs):
+        runid = None
+        if len(args) > 0 and isinstance(args[0], int) and \
+                not isinstance(args[0], bool):
+            runid = args[0]
+        with self._instrument.timer(phase, runid=runid) as record:
+            result = func(*args, **kwargs)
+            if kwargs.get('with_id', False):
+                record['runid'] = result[0]
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._objfun, name)
+        if not callable(attr):
+            return attr
+        return partial(self._call, f'server.{name}', attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._call('server.call', self._objfun, *args, **kwargs)
+
+
+def load_records(directory: Path,
+                 runids: Optional[Sequence[int]] = None) -> \
+        Iterator[Dict[str, Any]]:
+    """read the records written by an instrument
+
+    :param directory: the directory containing the records
+    :param runids: only read the records of these runs
+    """
+    instrument = Instrument(directory, enabled=False)
+    if runids is None:
+        names = sorted(Path(directory).glob('*.jsonl'))
+    else:
+        names = [instrument.records_name(r) for r in runids]
+    for name in names:
+        if not name.exists():
+            continue
+        with name.open() as records:
+            for line in records:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarise(records: Iterator[Dict[str, Any]],
+              percentiles: Sequence[float] = PERCENTILES) -> \
+        Dict[str, Dict[str, float]]:
+    """compute latency statistics per phase
+
+    :param records: the records to summarise
+    :param percentiles: the percentiles to compute
+    :return: dictionary mapping phases to the number of records, the
+             number of errors, the total time and the percentiles
+    """
+    import numpy
+
+    durations: Dict[str, list] = {}
+    errors: Dict[str, int] = {}
+    for record in records:
+        phase = record['phase']
+        durations.setdefault(phase, []).append(record['duration'])
+        errors[phase] = errors.get(phase, 0) + ('error' in record)
+    summary = {}
+    for phase in sorted(durations):
+        d = numpy.array(durations[phase])
+        summary[phase] = {'count': len(d), 'errors': errors[phase],
+                          'total': float(d.sum())}
+        for p, v in zip(percentiles, numpy.percentile(d, percentiles)):
+            summary[phase][f'p{p}'] = float(v)
+        summary[phase]['max'] = float(d.max())
+    return summary
+
+
+def main():
+    from .config import ModelOptimisationConfig
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', type=Path,
+                        help="name of configuration file")
+    parser.add_argument('-i', '--runid', type=int, nargs='+',
+                        help="only summarise the runs with these IDs")
+    parser.add_argument('-c', '--command',
+                        help="only summarise records of this command")
+    args = parser.parse_args()
+
+    config = ModelOptimisationConfig(args.config)
+
+    records = load_records(config.instrument.directory, runids=args.runid)
+    if args.command is not None:
+        records = (r for r in records if r['command'] == args.command)
+    summary = summarise(records)
+    if len(summary) == 0:
+        parser.error(f'no records found in {config.instrument.directory}')
+
+    columns = ['count', 'errors', 'total'] + \
+        [f'p{p}' for p in PERCENTILES] + ['max']
+    width = max(len(phase) for phase in summary)
+    print(f'{"phase":<{width}}' + ''.join(f'{c:>12}' for c in columns))
+    for phase in summary:
+        stats = summary[phase]
+        times = ''.join(f'{stats[c]:>12.4g}' for c in columns[2:])
+        print(f'{phase:<{width}}'
+              f'{stats["count"]:>12d}{stats["errors"]:>12d}{times}')
+
+
+if __name__ == '__main__':
+    main()
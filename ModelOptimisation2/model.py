@@ -1,15 +1,24 @@
-__all__ = ['NMLValue', 'BaseNamelistValue', 'SimpleNamelistValue',
-           'RepeatedNamelistValue', 'InterpolatedValue', 'NamelistModel']
+__all__ = ['NMLValue', 'PiecewiseLinear', 'BaseNamelistValue',
+           'SimpleNamelistValue', 'RepeatedNamelistValue', 'InterpolatedValue',
+           'NamelistTemplate', 'namelist_template', 'RestartFile',
+           'NamelistModel']
 
 from abc import abstractmethod
+import bisect
 from dataclasses import dataclass
-from typing import Any, Sequence, Dict
+import numbers
+from typing import Any, Sequence, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING
 from pathlib import Path
-from scipy.interpolate import interp1d
-from numpy.typing import ArrayLike
+import io
 import logging
+import shutil
+import threading
 import f90nml
 
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
+
 
 @dataclass
 class NMLValue:
@@ -26,11 +35,65 @@ class NMLValue:
     value: Any
 
 
+class PiecewiseLinear:
+    """a piecewise linear function
+
+    The function can be evaluated for scalars, which is done in pure
+    python, and for arrays, which uses numpy. Values outside the range
+    of the nodes raise a ValueError.
+
+    :param x: array of x coordinates of the nodes in increasing order
+    :type x: arraylike
+    :param y: array of y coordinates of the nodes
+    :type y: arraylike
+    """
+
+    def __init__(self, x: 'ArrayLike', y: 'ArrayLike'):
+        """constructor"""
+        self._x = [float(v) for v in x]
+        self._y = [float(v) for v in y]
+        if len(self._x) != len(self._y):
+            raise ValueError('x and y must have the same length')
+        if len(self._x) < 2:
+            raise ValueError('need at least two nodes')
+        if any(x0 >= x1 for x0, x1 in zip(self._x[:-1], self._x[1:])):
+            raise ValueError('x must be strictly increasing')
+
+    def _check_bounds(self, lower, upper):
+        if lower < self._x[0]:
+            raise ValueError(f'value {lower} is below the interpolation '
+                             f'range {self._x[0]}')
+        if upper > self._x[-1]:
+            raise ValueError(f'value {upper} is above the interpolation '
+                             f'range {self._x[-1]}')
+
+    def __call__(self, value):
+        if isinstance(value, numbers.Real):
+            value = float(value)
+            self._check_bounds(value, value)
+            i = min(bisect.bisect_right(self._x, value),
+                    len(self._x) - 1) - 1
+            slope = (self._y[i + 1] - self._y[i]) / \
+                (self._x[i + 1] - self._x[i])
+            return slope * (value - self._x[i]) + self._y[i]
+
+        import numpy
+        value = numpy.asarray(value, dtype=float)
+        if value.size > 0:
+            self._check_bounds(value.min(), value.max())
+        return numpy.interp(value, self._x, self._y)
+
+
 class BaseNamelistValue:
     def __init__(self, nmlfile: str, nmlgroup: str):
         self._nmlfile = nmlfile
         self._nmlgroup = nmlgroup
 
+    @property
+    def nmlfiles(self) -> Sequence[str]:
+        """the namelist files modified by the value"""
+        return [self._nmlfile]
+
     def _get_nmlval(self, key, value):
         return NMLValue(nmlfile=self._nmlfile,
                         nmlgroup=self._nmlgroup,
@@ -42,6 +105,25 @@ class BaseNamelistValue:
         """turn value into a list of namelist key/value pairs"""
         pass
 
+    def many(self, values: Sequence[Any]) -> Sequence[NMLValue]:
+        """turn a sequence of values into a list of namelist key/value pairs
+
+        The value of each returned pair is a list containing one entry
+        per input value. The default implementation calls the value
+        for each input, derived classes override it with a vectorised
+        version.
+
+        :param values: a sequence of values
+        """
+        results = [self(v) for v in values]
+        if len(results) == 0:
+            return []
+        return [NMLValue(nmlfile=nml.nmlfile,
+                         nmlgroup=nml.nmlgroup,
+                         nmlkey=nml.nmlkey,
+                         value=[r[i].value for r in results])
+                for i, nml in enumerate(results[0])]
+
 
 class SimpleNamelistValue(BaseNamelistValue):
     """a simple namelist value
@@ -63,6 +145,9 @@ class SimpleNamelistValue(BaseNamelistValue):
     def __call__(self, value: Any) -> Sequence[NMLValue]:
         return [self._get_nmlval(self._nmlkey, value)]
 
+    def many(self, values: Sequence[Any]) -> Sequence[NMLValue]:
+        return [self._get_nmlval(self._nmlkey, list(values))]
+
 
 class RepeatedNamelistValue(BaseNamelistValue):
     """a repeated namelist value
@@ -86,6 +171,10 @@ class RepeatedNamelistValue(BaseNamelistValue):
             values.append(self._get_nmlval(k, value))
         return values
 
+    def many(self, values: Sequence[Any]) -> Sequence[NMLValue]:
+        values = list(values)
+        return [self._get_nmlval(k, values) for k in self._nmlkeys]
+
 
 class InterpolatedValue(BaseNamelistValue):
     """an interpolated namelist value
@@ -107,37 +196,260 @@ class InterpolatedValue(BaseNamelistValue):
      """
     def __init__(self, nmlfile: str, nmlgroup: str,
                  nmlkey1: str, nmlkey2: str,
-                 x: ArrayLike, y: ArrayLike):
+                 x: 'ArrayLike', y: 'ArrayLike'):
         super().__init__(nmlfile, nmlgroup)
         self._nmlkey1 = nmlkey1
         self._nmlkey2 = nmlkey2
 
-        self._interp = interp1d(x, y, kind='linear', bounds_error=True,
-                                assume_sorted=True)
+        self._interp = PiecewiseLinear(x, y)
 
     def __call__(self, value):
         return [self._get_nmlval(self._nmlkey1, value=value),
                 self._get_nmlval(self._nmlkey2,
                                  value=float(self._interp(value)))]
 
+    def many(self, values):
+        interpolated = self._interp(values)
+        return [self._get_nmlval(self._nmlkey1, value=list(values)),
+                self._get_nmlval(self._nmlkey2, value=interpolated.tolist())]
+
+
+class NamelistTemplate:
+    """a pre-parsed namelist file
+
+    The template records where the values of the patched keys are
+    located in the output of :func:`f90nml.patch`. Patched files are
+    then produced by splicing the new values into the cached text
+    which is identical to running :func:`f90nml.patch`. Patches that
+    cannot be spliced, eg lists longer than the original value, are left
+    to :func:`f90nml.patch`.
+
+    :param nmlname: the name of the namelist file
+    :type nmlname: Path
+    """
+
+    SENTINEL = 'MO2TEMPLATE{0}'
+
+    def __init__(self, nmlname: Path):
+        """constructor"""
+        self._nmlname = Path(nmlname)
+        stat = self._nmlname.stat()
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+        self._text = self._nmlname.read_text()
+        self._nml = f90nml.read(self._nmlname)
+        self._layouts: Dict[tuple, Optional[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def text(self) -> str:
+        """the original text of the namelist file"""
+        return self._text
+
+    @property
+    def stamp(self) -> Tuple[int, int]:
+        """modification time and size of the namelist file"""
+        return self._stamp
+
+    @staticmethod
+    def format(value) -> str:
+        """the Fortran representation of a value written by f90nml
+
+        :param value: a boolean, integer, float or string
+        """
+        text = str(f90nml.Namelist({'mo2': {'value': value}}))
+        return text[text.index('=') + 1:text.rindex('/')].strip()
+
+    @staticmethod
+    def _supported(value):
+        return isinstance(value, (bool, int, float, str))
+
+    def _length(self, group, key):
+        value = self._nml[group][key]
+        return len(value) if isinstance(value, list) else 1
+
+    def grows(self, patch: Dict[str, Dict[str, Any]]) -> bool:
+        """whether the patch has lists longer than the original values
+
+        :param patch: dictionary of namelist groups containing dictionaries
+                      of keys and values
+        """
+        for group in patch:
+            for key, value in patch[group].items():
+                if isinstance(value, list) and group in self._nml and \
+                   key in self._nml[group] and \
+                   len(value) > self._length(group, key):
+                    return True
+        return False
+
+    def _signature(self, patch):
+        signature = []
+        for group in patch:
+            if group not in self._nml:
+                return None
+            for key, value in patch[group].items():
+                if key not in self._nml[group]:
+                    return None
+                if isinstance(value, list):
+                    if not all(self._supported(v) for v in value) or \
+                       len(value) > self._length(group, key):
+                        return None
+                    signature.append((group, key, len(value)))
+                elif self._supported(value):
+                    signature.append((group, key, None))
+                else:
+                    return None
+        return tuple(signature)
+
+    def _build_layout(self, signature):
+        # patch the namelist with unique sentinel values and record
+        # where they end up in the output
+        sentinels = {}
+        patch: Dict[str, Dict[str, Any]] = {}
+        for group, key, length in signature:
+            indices = [None] if length is None else range(length)
+            values = []
+            for idx in indices:
+                sentinel = self.SENTINEL.format(len(sentinels))
+                sentinels[self.format(sentinel)] = (group, key, idx)
+                values.append(sentinel)
+            patch.setdefault(group, {})[key] = \
+                values[0] if length is None else values
+
+        output = io.StringIO()
+        f90nml.patch(str(self._nmlname), patch, output)
+        text = output.getvalue()
+
+        spans = []
+        for sentinel, location in sentinels.items():
+            start = text.find(sentinel)
+            # the value was not patched or the list is longer than the
+            # original value
+            if start == -1 or text.find(sentinel, start + 1) != -1:
+                return None
+            spans.append((start, start + len(sentinel)) + location)
+        spans.sort()
+        return text, spans
+
+    def patch(self, patch: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """patch the namelist
+
+        :param patch: dictionary of namelist groups containing dictionaries
+                      of keys and values
+        :return: the patched namelist or None if the template cannot be
+                 used for the patch
+        """
+        signature = self._signature(patch)
+        if signature is None:
+            return None
+        with self._lock:
+            if signature not in self._layouts:
+                self._layouts[signature] = self._build_layout(signature)
+            layout = self._layouts[signature]
+        if layout is None:
+            return None
+
+        text, spans = layout
+        pieces = []
+        pos = 0
+        for start, end, group, key, idx in spans:
+            value = patch[group][key]
+            if idx is not None:
+                value = value[idx]
+            pieces.append(text[pos:start])
+            pieces.append(self.format(value))
+            pos = end
+        pieces.append(text[pos:])
+        return ''.join(pieces)
+
+
+_TEMPLATES: Dict[Path, NamelistTemplate] = {}
+_TEMPLATES_LOCK = threading.Lock()
+
+
+def namelist_template(nmlname: Path) -> Optional[NamelistTemplate]:
+    """get the cached template for a namelist file
+
+    The template is reloaded if the file has been modified.
+
+    :param nmlname: the name of the namelist file
+    :return: the template or None if the file does not exist
+    """
+    nmlname = Path(nmlname).absolute()
+    try:
+        stat = nmlname.stat()
+    except FileNotFoundError:
+        return None
+    with _TEMPLATES_LOCK:
+        template = _TEMPLATES.get(nmlname)
+        if template is None or \
+           template.stamp != (stat.st_mtime_ns, stat.st_size):
+            template = NamelistTemplate(nmlname)
+            _TEMPLATES[nmlname] = template
+    return template
+
+
+@dataclass
+class RestartFile:
+    """restart files a run can be started from
+
+    :param pattern: glob pattern of the restart files written by a run
+                    relative to the model directory, the last file in
+                    sorted order is used
+    :param nmlfile: the name of the namelist file pointing to the restart
+                    file, None if the model reads the file by its name
+    :param nmlgroup: the name of the namelist
+    :param nmlkey: the key set to the name of the restart file
+    """
+    pattern: str
+    nmlfile: Optional[str] = None
+    nmlgroup: Optional[str] = None
+    nmlkey: Optional[str] = None
+
+    def __post_init__(self):
+        if not self.pattern:
+            raise ValueError('the pattern of the restart files is empty')
+        if self.nmlfile is None:
+            if self.nmlgroup is not None or self.nmlkey is not None:
+                raise ValueError(f'restart files {self.pattern}: namelist '
+                                 'group and key need a namelist file')
+        elif not self.nmlgroup or not self.nmlkey:
+            raise ValueError(f'restart files {self.pattern}: namelist file '
+                             f'{self.nmlfile} needs a group and a key')
+
 
 class NamelistModel:
     """a model configured by namelists
 
     :param directory: the base directory where model configuration is kept
+    :param clone: the directory the model configuration was cloned from.
+                  If set, the namelists in the clone directory are used as
+                  cached templates when writing parameters
     """
 
     NAMELIST_MAP: Dict[str, BaseNamelistValue] = {}
+    RESTART_FILES: Sequence[RestartFile] = []
 
-    def __init__(self, directory: Path):
+    def __init__(self, directory: Path, clone: Optional[Path] = None):
         """constructor"""
 
         self._directory = directory
+        self._clone = clone
 
     @property
     def directory(self) -> Path:
         return self._directory
 
+    @classmethod
+    def namelist_files(cls) -> Sequence[Path]:
+        """the namelist files modified by the model parameters"""
+        files = set()
+        for value in cls.NAMELIST_MAP.values():
+            files.update(Path(f) for f in value.nmlfiles)
+        for restart in cls.RESTART_FILES:
+            if restart.nmlfile is not None:
+                files.add(Path(restart.nmlfile))
+        return sorted(files)
+
     def process_params(self, params: Dict[str, Any]) -> \
             Dict[Path, Dict[str, Dict[str, Any]]]:
         """map dictionary of parameters to dictionary of namelist files
@@ -157,19 +469,116 @@ class NamelistModel:
                 output[nml.nmlfile][nml.nmlgroup][nml.nmlkey] = nml.value
         return output
 
+    def process_params_many(self, params_list: Sequence[Dict[str, Any]]) -> \
+            Sequence[Dict[Path, Dict[str, Dict[str, Any]]]]:
+        """map a sequence of parameter dictionaries to namelist files
+
+        This is equivalent to calling :meth:`process_params` for each
+        entry of the sequence but each mapping is only evaluated once
+        for all parameter sets.
+
+        :param params_list: a sequence of dictionaries containing
+                            parameter names and values
+        """
+        outputs: List[Dict[Path, Dict[str, Dict[str, Any]]]] = \
+            [{} for params in params_list]
+        # collect the members that set each parameter
+        members: Dict[str, List[int]] = {}
+        for i, params in enumerate(params_list):
+            for key in params:
+                if key not in members:
+                    if key not in self.NAMELIST_MAP:
+                        raise LookupError(
+                            f'parameter {key} not mapped to namelist')
+                    members[key] = []
+                members[key].append(i)
+        # map all values of a parameter at once
+        for key in members:
+            values = [params_list[i][key] for i in members[key]]
+            for nml in self.NAMELIST_MAP[key].many(values):
+                for i, value in zip(members[key], nml.value):
+                    output = outputs[i]
+                    if nml.nmlfile not in output:
+                        output[nml.nmlfile] = {}
+                    if nml.nmlgroup not in output[nml.nmlfile]:
+                        output[nml.nmlfile][nml.nmlgroup] = {}
+                    output[nml.nmlfile][nml.nmlgroup][nml.nmlkey] = value
+        return outputs
+
     def write_params(self, params: Dict[str, Any]) -> None:
         """modify namelists with parameters from dictionary
 
         :param params: a dictionary containing parameter names and values
         """
-        output = self.process_params(params)
+        self._write_namelists(self.process_params(params))
+
+    def warm_start(self, source: Path) -> List[Path]:
+        """start the model from the restart files of another run
 
+        The latest restart files of the run are copied to the model
+        directory and the namelists are pointed to them. Backups of the
+        namelists written by :meth:`write_params` are kept.
+
+        :param source: the model directory of the run
+        :return: the restart files copied to the model directory
+        """
+        output: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        copied = []
+        for restart in self.RESTART_FILES:
+            files = sorted(Path(source).glob(restart.pattern))
+            if len(files) == 0:
+                logging.warning(f'no restart file {restart.pattern} '
+                                f'in {source}')
+                continue
+            name = files[-1].relative_to(source)
+            target = self.directory / name
+            # do not modify a linked file of the clone
+            if target.exists() or target.is_symlink():
+                target.unlink()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(files[-1], target)
+            copied.append(target)
+            if restart.nmlfile is not None:
+                group = output.setdefault(restart.nmlfile, {}).setdefault(
+                    restart.nmlgroup, {})
+                group[restart.nmlkey] = str(name)
+        self._write_namelists(output, keep_backup=True)
+        return copied
+
+    def _write_namelists(self, output, keep_backup=False):
         # write output namelist files
         for nml in output:
             nmlname = self.directory / nml
             if nmlname.exists():
-                old = nmlname.with_suffix('.nml~')
+                backup = nmlname.with_suffix('.nml~')
+                if keep_backup and backup.exists():
+                    # the backup holds the original namelist
+                    old = nmlname.with_suffix('.nml.tmp')
+                else:
+                    old = backup
                 nmlname.replace(old)
-                f90nml.patch(old, output[nml], nmlname)
+                self._patch_namelist(nml, old, output[nml], nmlname)
+                if old != backup:
+                    old.unlink()
             else:
                 logging.warning(f'no namelist file {nmlname}')
+
+    def _patch_namelist(self, nml, old, patch, nmlname):
+        if self._clone is not None:
+            template = namelist_template(Path(self._clone) / nml)
+            if template is not None and old.read_text() == template.text:
+                text = template.patch(patch)
+                if text is not None:
+                    nmlname.write_text(text)
+                    return
+        has_lists = any(isinstance(value, list)
+                        for group in patch.values()
+                        for value in group.values())
+        if has_lists and NamelistTemplate(old).grows(patch):
+            # f90nml.patch truncates lists that are longer than the
+            # original values, rewrite the whole namelist instead
+            namelist = f90nml.read(old)
+            namelist.patch(patch)
+            namelist.write(nmlname)
+            return
+        f90nml.patch(old, patch, nmlname)
@@ -1,10 +1,204 @@
 import argparse
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import shutil
+import sys
 import ObjectiveFunction_client
 
 from .config import ModelOptimisationConfig
+from .clone import CLONE_MODES, clone_model
+
+
+def configure(config, clonedir, clone_mode, runid, params, source=None):
+    """clone the model setup and apply the parameters
+
+    :param config: the model optimisation configuration
+    :param clonedir: the model setup to clone
+    :param clone_mode: how to clone the model setup
+    :param runid: the ID of the run, None for the default run
+    :param params: a dictionary containing parameter names and values
+    :param source: the model directory of a run whose restart files are
+                   used to start the model
+    :return: the model directory
+    """
+    modeldir = config.modelDir(runid, create=True)
+    try:
+        with config.instrument.timer('clone', runid=runid):
+            clone_model(clonedir, modeldir, mode=clone_mode,
+                        materialise=config.model.namelist_files())
+
+        model = config.model(modeldir, clone=clonedir)
+        with config.instrument.timer('write_params', runid=runid):
+            model.write_params(params)
+        if source is not None:
+            with config.instrument.timer('warm_start', runid=runid):
+                model.warm_start(source)
+        config.writeRunParams(runid, params)
+    except Exception:
+        # remove the partial model directory so the run can be retried
+        shutil.rmtree(modeldir)
+        raise
+    return modeldir
+
+
+def runs_in_state(config, state):
+    """find the runs with a model directory in a state
+
+    Runs pruned by mo2-monitor are ignored.
+
+    :param config: the model optimisation configuration
+    :param state: the state of the runs
+    :return: sorted list of run IDs
+    """
+    runids = []
+    for modeldir in config.basedir.glob('run_*'):
+        runid_name = modeldir / config.RUNID
+        if not runid_name.exists() or (modeldir / config.PRUNED).exists():
+            continue
+        runids.append(int(runid_name.read_text()))
+    objfun = config.asyncObjectiveFunction
+    states = objfun.run(objfun.get_states(runids))
+    return sorted(runid for runid in runids if states[runid] == state)
+
+
+def completed_runs(config):
+    """index the model directories of the completed runs
+
+    :param config: the model optimisation configuration
+    :return: index of the model directories by parameter values
+    """
+    # numpy is slow to import, only import it when needed
+    from .neighbours import NeighbourIndex
+    objfun = config.objectiveFunction
+    index = NeighbourIndex(objfun.lower_bounds, objfun.upper_bounds,
+                           float('inf'))
+    for runid in runs_in_state(
+            config, ObjectiveFunction_client.LookupState.COMPLETED):
+        try:
+            params = config.runParams(runid)
+        except FileNotFoundError:
+            continue
+        index.add(objfun.params2values(params, include_constant=False),
+                  config.modelDir(runid))
+    return index
+
+
+def nearest_run(config, index, params):
+    """the model directory of the completed run nearest to parameters
+
+    :param config: the model optimisation configuration
+    :param index: index of the completed runs
+    :param params: a dictionary containing parameter names and values
+    :return: the model directory or None if there is no completed run
+    """
+    if index is None:
+        return None
+    nearest = index.nearest(config.objectiveFunction.params2values(
+        params, include_constant=False))
+    if nearest is None:
+        return None
+    logging.info(f'warm starting from {nearest[1]}')
+    return nearest[1]
+
+
+def claim_new_runs(config, num_runs):
+    """claim up to num_runs new runs for configuration
+
+    The runs are claimed with concurrent requests to the server.
+
+    :param config: the model optimisation configuration
+    :param num_runs: the maximum number of runs to claim
+    :return: a list of run ID, parameter tuples
+    """
+    objfun = config.asyncObjectiveFunction
+    return objfun.run(objfun.claim(
+        ObjectiveFunction_client.LookupState.NEW,
+        ObjectiveFunction_client.LookupState.CONFIGURING,
+        num_runs=num_runs))
+
+
+def _configure_run(config, clonedir, clone_mode, runid, params, index):
+    try:
+        modeldir = configure(config, clonedir, clone_mode, runid, params,
+                             nearest_run(config, index, params))
+    except Exception:
+        logging.exception(f'failed to configure run {runid}')
+        # hand the run back so that it can be configured again
+        config.objectiveFunction.setState(
+            runid, ObjectiveFunction_client.LookupState.NEW)
+        return None
+    config.objectiveFunction.setState(
+        runid, ObjectiveFunction_client.LookupState.CONFIGURED)
+    return modeldir
+
+
+def configure_batch(config, clonedir, clone_mode, runs, workers=None,
+                    warm_start=False):
+    """configure claimed runs concurrently
+
+    Runs that were configured successfully are moved to the
+    CONFIGURED state while the remaining runs are being configured.
+    Runs that could not be configured are moved back to the NEW state.
+
+    :param config: the model optimisation configuration
+    :param clonedir: the model setup to clone
+    :param clone_mode: how to clone the model setup
+    :param runs: a list of run ID, parameter tuples
+    :param workers: the number of worker threads
+    :param warm_start: start the runs from the restart files of the
+                       nearest completed runs
+    :return: a list of model directories and a list of failed run IDs
+    """
+    index = completed_runs(config) if warm_start else None
+    modeldirs = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_configure_run, config, clonedir,
+                                   clone_mode, runid, params, index): runid
+                   for runid, params in runs}
+        for future in as_completed(futures):
+            try:
+                modeldir = future.result()
+            except Exception:
+                # the run could not be handed back either
+                logging.exception(f'failed to reset run {futures[future]}')
+                modeldir = None
+            if modeldir is None:
+                failed.append(futures[future])
+            else:
+                modeldirs.append(modeldir)
+    return sorted(modeldirs), sorted(failed)
+
+
+def _clone_setup(parser, args, config):
+    if args.clone is not None:
+        clonedir = Path(args.clone)
+    else:
+        clonedir = config.cloneDir
+    if clonedir is None:
+        parser.error('no clone directory specified')
+    if not clonedir.is_dir():
+        parser.error(f'clone directory {clonedir} does not exist')
+
+    if args.clone_mode is not None:
+        clone_mode = args.clone_mode
+    else:
+        clone_mode = config.cloneMode
+    return clonedir, clone_mode
+
+
+def _main_batch(parser, args, config, clonedir, clone_mode):
+    runs = claim_new_runs(config, args.batch)
+    if len(runs) == 0:
+        parser.error('no new runs')
+    modeldirs, failed = configure_batch(config, clonedir, clone_mode,
+                                        runs, workers=args.workers,
+                                        warm_start=args.warm_start)
+    for modeldir in modeldirs:
+        print(modeldir)
+    if len(failed) > 0:
+        sys.exit(1)
 
 
 def main():
@@ -18,19 +212,32 @@ def main():
                         help="use default values from config file")
     parser.add_argument('-C', '--clone',
                         help="model setup to clone")
+    parser.add_argument('-m', '--clone-mode', choices=CLONE_MODES,
+                        help="how to clone the model setup, "
+                        "overrides the configuration")
+    parser.add_argument('-W', '--warm-start', action='store_true',
+                        default=False,
+                        help="start the model from the restart files of "
+                        "the completed run with the nearest parameters")
+    parser.add_argument('-b', '--batch', type=int, metavar='N',
+                        help="configure up to N new runs")
+    parser.add_argument('-w', '--workers', type=int, metavar='K',
+                        help="number of runs to configure concurrently "
+                        "in batch mode")
     args = parser.parse_args()
 
+    if args.batch is not None:
+        if args.default_values:
+            parser.error('cannot use default values in batch mode')
+        if args.batch < 1:
+            parser.error('batch size must be positive')
+
     config = ModelOptimisationConfig(args.config)
-    modeldir = config.basedir
+    clonedir, clone_mode = _clone_setup(parser, args, config)
 
-    if args.clone is not None:
-        clonedir = Path(args.clone)
-    else:
-        clonedir = config.cloneDir
-    if clonedir is None:
-        parser.error('no clone directory specified')
-    if not clonedir.is_dir():
-        parser.error(f'clone directory {clonedir} does not exist')
+    if args.batch is not None:
+        _main_batch(parser, args, config, clonedir, clone_mode)
+        return
 
     if args.default_values:
         params = config.values
@@ -43,11 +250,11 @@ def main():
         except LookupError as e:
             parser.error(e)
 
-    modeldir = config.modelDir(runid, create=True)
-    shutil.copytree(clonedir, modeldir, dirs_exist_ok=True)
-
-    model = config.model(modeldir)
-    model.write_params(params)
+    source = None
+    if args.warm_start:
+        source = nearest_run(config, completed_runs(config), params)
+    modeldir = configure(config, clonedir, clone_mode, runid, params,
+                         source=source)
 
     if runid is not None:
         config.objectiveFunction.setState(
@@ -0,0 +1,172 @@
+import argparse
+import logging
+from pathlib import Path
+import time
+import numpy
+import ObjectiveFunction_client
+
+from .config import ModelOptimisationConfig
+from .model_config import runs_in_state
+from .simobs_dummy import extract
+from .transition import _transition
+
+
+def cost(obs, targets):
+    """the sum of squared residuals
+
+    :param obs: the simulated observations
+    :param targets: the target values of the observations
+    """
+    return float(((numpy.asarray(obs, dtype=float) - targets) ** 2).sum())
+
+
+def should_prune(partial_cost, completed_costs, keep=0.5, min_runs=5):
+    """decide whether a run cannot improve the optimisation
+
+    Similar to successive halving a run is pruned if the cost of its
+    partial output is worse than the given fraction of the completed
+    runs.
+
+    :param partial_cost: the cost of the partial output of the run
+    :param completed_costs: the costs of the completed runs
+    :param keep: the fraction of completed runs a run needs to beat
+    :param min_runs: the minimum number of completed runs before runs
+                     are pruned
+    """
+    if len(completed_costs) < max(min_runs, 1):
+        return False
+    return partial_cost > numpy.quantile(completed_costs, keep)
+
+
+def active_runs(config):
+    """find the runs in ACTIVE state
+
+    :param config: the model optimisation configuration
+    :return: sorted list of run IDs
+    """
+    return runs_in_state(config, ObjectiveFunction_client.LookupState.ACTIVE)
+
+
+def prune_run(config, cache, runid, penalty):
+    """stop a run and give a penalty to the optimiser instead of its result
+
+    The run is moved from ACTIVE straight to POSTPROCESSING while
+    holding its lock so that its job cannot complete it at the same
+    time. No result is uploaded, the run stays in POSTPROCESSING on the
+    server. The marker file written to the model directory tells the
+    job to stop the model and identifies the run as pruned. The penalty
+    is only stored in the local cache, the optimiser needs the cache to
+    receive it. It is neither cached as a result nor used to train the
+    emulator.
+
+    :param config: the model optimisation configuration
+    :param cache: the local cache of completed runs
+    :param runid: the ID of the run
+    :param penalty: the simulated observations given to the optimiser
+    :return: whether the run was pruned, False if it was no longer active
+    """
+    objfun = config.objectiveFunction
+    params = config.runParams(runid)
+    with config.lockRun(runid):
+        try:
+            _transition(objfun, runid,
+                        ObjectiveFunction_client.LookupState.ACTIVE,
+                        ObjectiveFunction_client.LookupState.POSTPROCESSING)
+        except RuntimeError as e:
+            logging.info(f'not pruning run {runid}: {e}')
+            return False
+        (config.modelDir(runid) / config.PRUNED).touch()
+        cache.prune(objfun.params2values(params, include_constant=False),
+                    penalty)
+    config.notifyResult()
+    return True
+
+
+def _partial_output(config, runid, fname, names, extractor):
+    if not fname.exists():
+        return None
+    try:
+        with config.instrument.timer('extract_partial', runid=runid):
+            return extractor(fname, names)
+    except Exception as e:
+        # the model might be writing the file
+        logging.debug(f'could not read partial output of run {runid}: {e}')
+        return None
+
+
+def monitor(config, cache, data_file, keep=0.5, min_runs=5,
+            extractor=extract):
+    """check the partial output of all active runs once
+
+    :param config: the model optimisation configuration
+    :param cache: the local cache of completed runs
+    :param data_file: the name of the partial output relative to the
+                      model directory
+    :param keep: the fraction of completed runs a run needs to beat
+    :param min_runs: the minimum number of completed runs before runs
+                     are pruned
+    :param extractor: callable taking the name of the data file and the
+                      observation names that returns the simulated
+                      observations
+    :return: the IDs of the pruned runs
+    """
+    targets = config.targets
+    # the optimiser adds to the completed runs
+    cache.refresh()
+    costs = [cost(obs, targets) for x, obs in cache.items()]
+    names = list(config.cfg['targets'])
+    pruned = []
+    for runid in active_runs(config):
+        simobs = _partial_output(config, runid,
+                                 config.modelDir(runid) / data_file, names,
+                                 extractor)
+        if simobs is None:
+            continue
+        partial_cost = cost(simobs, targets)
+        if should_prune(partial_cost, costs, keep=keep, min_runs=min_runs):
+            logging.info(f'pruning run {runid} with cost {partial_cost}')
+            # the optimiser gets the partial output of the run itself
+            if prune_run(config, cache, runid, simobs):
+                pruned.append(runid)
+    return pruned
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', type=Path,
+                        help="name of configuration file")
+    parser.add_argument('-d', '--data-file', type=Path,
+                        default=Path('results.nc'),
+                        help="name of the partial output in the model "
+                        "directory, default results.nc")
+    parser.add_argument('-k', '--keep', type=float, default=0.5,
+                        help="prune runs whose partial output is worse "
+                        "than this fraction of the completed runs, "
+                        "default 0.5")
+    parser.add_argument('-n', '--min-runs', type=int, default=5, metavar='N',
+                        help="only prune runs once N runs have been "
+                        "completed, default 5")
+    parser.add_argument('-p', '--poll', type=float, metavar='SECONDS',
+                        help="check the active runs every SECONDS "
+                        "seconds instead of once")
+    args = parser.parse_args()
+
+    if not 0 <= args.keep <= 1:
+        parser.error('the fraction of runs to keep must be between 0 and 1')
+
+    config = ModelOptimisationConfig(args.config)
+    cache = config.resultCache
+
+    while True:
+        for runid in monitor(config, cache, args.data_file, keep=args.keep,
+                             min_runs=args.min_runs):
+            print(config.modelDir(runid))
+        if args.poll is None:
+            break
+        time.sleep(args.poll)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+__all__ = ['NeighbourIndex']
+
+from typing import Any, Optional, Tuple
+import numpy
+
+# the number of points added before the tree is rebuilt
+REBUILD = 256
+
+
+class NeighbourIndex:
+    """find a stored point close to given parameter values
+
+    The parameter values are scaled to the unit cube by the bounds and
+    two points are neighbours if all their scaled parameter values
+    differ by less than the tolerance. The points are kept in a KD-tree
+    that is rebuilt once enough new points have been added. Until then
+    new points are searched directly.
+
+    :param lower: the lower bounds of the parameters
+    :param upper: the upper bounds of the parameters
+    :param tolerance: the maximum distance relative to the bounds
+    :param rebuild: the number of points added before the tree is rebuilt
+    """
+
+    def __init__(self, lower, upper, tolerance: float,
+                 rebuild: int = REBUILD):
+        """constructor"""
+        if tolerance < 0:
+            raise ValueError('tolerance must not be negative')
+        self._lower = numpy.asarray(lower, dtype=float)
+        self._scale = numpy.asarray(upper, dtype=float) - self._lower
+        self._tolerance = tolerance
+        self._rebuild = rebuild
+        self._tree = None
+        self._values = []
+        self._new_points = []
+        self._new_values = []
+
+    def __len__(self):
+        return len(self._values) + len(self._new_values)
+
+    @property
+    def tolerance(self) -> float:
+        return self._tolerance
+
+    def _normalise(self, x):
+        return (numpy.asarray(x, dtype=float) - self._lower) / self._scale
+
+    def add(self, x, value) -> None:
+        """add a point
+
+        :param x: the parameter values
+        :param value: the value stored with the point
+        """
+        self._new_points.append(self._normalise(x))
+        self._new_values.append(value)
+        if len(self._new_values) >= self._rebuild:
+            self._build()
+
+    def _build(self):
+        # scipy is slow to import, only import it when needed
+        from scipy.spatial import cKDTree
+        points = self._new_points
+        if self._tree is not None:
+            points = numpy.concatenate([self._tree.data, points])
+        self._tree = cKDTree(points)
+        self._values.extend(self._new_values)
+        self._new_points = []
+        self._new_values = []
+
+    def nearest(self, x) -> Optional[Tuple[float, Any]]:
+        """find the nearest point closer than the tolerance
+
+        :param x: the parameter values
+        :return: the distance and value of the nearest point or None if
+                 there is no point closer than the tolerance
+        """
+        x = self._normalise(x)
+        best = None
+        if self._tree is not None:
+            distance, i = self._tree.query(
+                x, p=numpy.inf, distance_upper_bound=self._tolerance)
+            if i < len(self._values):
+                best = (distance, self._values[i])
+        if len(self._new_points) > 0:
+            distances = numpy.abs(numpy.array(self._new_points) - x).max(
+                axis=1)
+            i = distances.argmin()
+            if distances[i] < self._tolerance and \
+                    (best is None or distances[i] < best[0]):
+                best = (distances[i], self._new_values[i])
+        return best
@@ -1,76 +1,523 @@
 import argparse
+import json
 import logging
 from pathlib import Path
 from dfols import solve
+import numpy
+import shlex
+import subprocess
 import sys
+import time
 import ObjectiveFunction_client
 
 from .config import ModelOptimisationConfig
+from .checkpoint import Checkpoint
 
+# initial trust region radius in coordinates scaled by the bounds
+RHOBEG = 0.1
 
-def residual(cfg, x):
-    obs = cfg.objectiveFunction(x)
+CHECKPOINT = Path('optimise.checkpoint')
+START = Path('optimise.start')
+
+# interval used to check for results signalled by the postprocessing
+NOTIFY_INTERVAL = 0.1
+
+
+def evaluate(cfg, x, cache=None):
+    obs = None
+    if cache is not None:
+        # runs pruned by mo2-monitor never get a result from the server
+        obs = cache.penalty(x)
+        if obs is not None:
+            return obs
+        obs = cache.get(x)
+    if obs is None:
+        obs = cfg.objectiveFunction(x)
+        if cache is not None:
+            cache.set(x, obs)
+    return obs
+
+
+def residual(cfg, x, checkpoint=None, cache=None):
+    obs = None
+    if checkpoint is not None:
+        obs = checkpoint.lookup(x)
+    if obs is None:
+        with cfg.instrument.timer('evaluate'):
+            obs = evaluate(cfg, x, cache=cache)
+        if checkpoint is not None:
+            checkpoint.record(x, obs)
 
     residual = obs - cfg.targets
     return residual
 
 
-def run_opt(config):
+def initial_design(x0, lower, upper, rhobeg=RHOBEG):
+    """the initial interpolation points used by DFO-LS
+
+    DFO-LS starts by evaluating the starting point and one step of
+    size rhobeg along each coordinate direction in coordinates scaled
+    by the bounds. These evaluations are independent of each other.
+
+    :param x0: the starting point
+    :param lower: the lower bounds
+    :param upper: the upper bounds
+    :param rhobeg: the initial trust region radius
+    :return: array of shape (n+1, n) of points
+    """
+    lower = numpy.asarray(lower, dtype=float)
+    upper = numpy.asarray(upper, dtype=float)
+    scale = upper - lower
+    xbase = numpy.clip((numpy.asarray(x0, dtype=float) - lower) / scale,
+                       0., 1.)
+    # the step is negative at the upper boundary
+    steps = numpy.where(1. - xbase < 0.01 * rhobeg, -rhobeg, rhobeg)
+    steps = numpy.clip(steps, -xbase, 1. - xbase)
+
+    points = numpy.repeat(xbase[None, :], len(xbase) + 1, axis=0)
+    points[1:] += numpy.diag(steps)
+    return lower + points * scale
+
+
+def submit(config, x):
+    """make sure there is a run for parameter set x
+
+    :param config: the model optimisation configuration
+    :param x: the parameter values
+    :return: True if a new run was created
+    """
     for i in range(2):
+        try:
+            config.objectiveFunction(x)
+        except ObjectiveFunction_client.PreliminaryRun:
+            continue
+        except ObjectiveFunction_client.NewRun:
+            return True
+        except ObjectiveFunction_client.Waiting:
+            pass
+        return False
+    return False
+
+
+def initial_values(config):
+    """the initial parameter values of the configuration
+
+    :param config: the model optimisation configuration
+    """
+    return config.objectiveFunction.params2values(config.values,
+                                                  include_constant=False)
+
+
+def submit_initial_design(config, x0=None):
+    """create runs for all initial interpolation points
+
+    :param config: the model optimisation configuration
+    :param x0: the starting point, defaults to the initial values
+    :return: the number of new runs
+    """
+    if x0 is None:
+        x0 = initial_values(config)
+    points = initial_design(
+        x0,
+        config.objectiveFunction.lower_bounds,
+        config.objectiveFunction.upper_bounds)
+    num_tasks = 0
+    for x in points:
+        if submit(config, x):
+            num_tasks += 1
+    return num_tasks
+
+
+def lookup_cached(cache, x):
+    """get the result of an evaluation from the local cache
+
+    :param cache: the local cache of completed runs
+    :param x: the parameter values
+    :return: the simulated observations, the penalty of a pruned run or
+             None if there is no cache to check them against
+    """
+    if cache is None:
+        return None
+    obs = cache.penalty(x)
+    if obs is None:
+        obs = cache.get(x)
+    if obs is None:
+        raise LookupError(f'no cached result for {x}')
+    return obs
+
+
+def load_checkpoint(config, cache=None):
+    """load the optimiser checkpoint from the base directory
+
+    The checkpoint is discarded if the server has no completed runs,
+    eg because it was reset, or if any logged evaluation does not match
+    the local cache of completed runs. The logged results are not
+    compared with the server, the client cannot look up the result of
+    parameter values without creating a run for unknown values.
+
+    :param config: the model optimisation configuration
+    :param cache: the local cache of completed runs
+    """
+    checkpoint = Checkpoint(config.basedir / CHECKPOINT)
+    if len(checkpoint) == 0:
+        return checkpoint
+    try:
+        config.objectiveFunction.get_with_state(
+            ObjectiveFunction_client.LookupState.COMPLETED)
+    except LookupError:
+        logging.warning(f'the server has no completed runs, discarding '
+                        f'checkpoint {checkpoint.fname}')
+        checkpoint.clear()
+        consistent = False
+    else:
+        consistent = checkpoint.verify(lambda x: lookup_cached(cache, x))
+    if not consistent:
+        # the optimiser starts afresh
+        (config.basedir / START).unlink(missing_ok=True)
+    return checkpoint
+
+
+def load_surrogate(config, cache, kappa):
+    """create an emulator trained on the completed runs of the cache
+
+    :param config: the model optimisation configuration
+    :param cache: the local cache of completed runs
+    :param kappa: the number of standard deviations of the optimistic
+                  prediction
+    """
+    # the emulator is only imported when needed
+    from .surrogate import Surrogate
+    return Surrogate.from_cache(cache,
+                                config.objectiveFunction.lower_bounds,
+                                config.objectiveFunction.upper_bounds,
+                                config.targets, kappa=kappa)
+
+
+def start_point(config, surrogate=None):
+    """the point the optimiser starts from
+
+    The start point is stored in the base directory so that the
+    optimiser is replayed from the same point on every invocation. A
+    new start point is chosen if there is none, it is proposed by the
+    emulator if there is one and it has enough training points.
+    Otherwise the optimiser starts from the initial values. The
+    emulator only chooses the start, the optimiser only sees results
+    of model runs.
+
+    :param config: the model optimisation configuration
+    :param surrogate: the emulator proposing the start point
+    """
+    fname = config.basedir / START
+    if fname.exists():
+        with fname.open() as start:
+            return numpy.array(json.load(start))
+    x0 = None
+    if surrogate is not None:
+        x0 = surrogate.propose()
+    if x0 is None:
+        return initial_values(config)
+    with fname.open('w') as start:
+        json.dump(numpy.asarray(x0, dtype=float).tolist(), start)
+    return x0
+
+
+def run_opt(config, checkpoint=None, cache=None, x0=None):
+    if x0 is None:
+        x0 = initial_values(config)
+    for i in range(2):
+        if checkpoint is not None:
+            checkpoint.rewind()
         # start with lower bounds
         try:
-            x = solve(
-                lambda x: residual(config, x),
-                config.objectiveFunction.params2values(
-                    config.values,
-                    include_constant=False),
-                bounds=(
-                    config.objectiveFunction.lower_bounds,
-                    config.objectiveFunction.upper_bounds),
-                scaling_within_bounds=True
-            )
+            with config.instrument.timer('solve'):
+                x = solve(
+                    lambda x: residual(config, x, checkpoint=checkpoint,
+                                       cache=cache),
+                    numpy.array(x0, dtype=float),
+                    bounds=(
+                        config.objectiveFunction.lower_bounds,
+                        config.objectiveFunction.upper_bounds),
+                    rhobeg=RHOBEG,
+                    scaling_within_bounds=True
+                )
         except ObjectiveFunction_client.PreliminaryRun:
             logging.info('new parameter set')
             continue
         return x
 
 
-def main():
-    logging.basicConfig(level=logging.INFO)
+class CommandLauncher:
+    """launch jobs for new runs by running a shell command
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument('config', type=Path,
-                        help="name of configuration file")
-    parser.add_argument('-g', '--generate-all', action='store_true',
-                        default=False, help="generate all tasks")
-    args = parser.parse_args()
+    The command is run in the background. The string {config} in the
+    command is replaced with the quoted name of the configuration file.
+    A job is expected to configure, run and postprocess one new run.
 
-    config = ModelOptimisationConfig(args.config)
+    :param command: the shell command
+    :param config_file: the name of the configuration file
+    """
 
-    if args.generate_all:
-        num_tasks = 0
-        waiting = False
+    def __init__(self, command, config_file):
+        self._command = command.format(config=shlex.quote(str(config_file)))
+        self._procs = []
+
+    def __call__(self):
+        self.check()
+        logging.info(f'launching {self._command}')
+        self._procs.append(subprocess.Popen(self._command, shell=True))
+
+    @property
+    def running(self) -> int:
+        """the number of jobs that have not been reaped"""
+        return len(self._procs)
+
+    def check(self):
+        """reap finished jobs
+
+        :raises RuntimeError: if a job exited with an error, its run
+                              will not produce a result
+        """
+        failed = [p.returncode for p in self._procs
+                  if p.poll() not in (None, 0)]
+        self._procs = [p for p in self._procs if p.returncode is None]
+        if len(failed) > 0:
+            raise RuntimeError(f'{len(failed)} jobs failed, command '
+                               f'{self._command} exited with status '
+                               f'{failed[0]}')
+
+    def wait(self):
+        """wait for all jobs to finish"""
+        for p in self._procs:
+            p.wait()
+        self.check()
+
+
+def wait_for_result(config, timeout):
+    """wait until a new result is signalled or the timeout expires
+
+    :param config: the model optimisation configuration
+    :param timeout: the maximum time to wait in seconds
+    :return: True if a new result was signalled
+    """
+    stamp = config.resultStamp()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(min(NOTIFY_INTERVAL, timeout))
+        if config.resultStamp() != stamp:
+            return True
+    return False
+
+
+def _try_residual(config, x, launcher, **kwargs):
+    # the residual or None if the result is not available yet
+    while True:
+        try:
+            return residual(config, x, **kwargs)
+        except ObjectiveFunction_client.PreliminaryRun:
+            logging.info('new parameter set')
+        except ObjectiveFunction_client.NewRun:
+            launcher()
+            return None
+        except ObjectiveFunction_client.Waiting:
+            return None
+
+
+def _deadline(timeout):
+    if timeout is None:
+        return float('inf')
+    return time.monotonic() + timeout
+
+
+def run_daemon(config, launcher, poll=60., checkpoint=None, cache=None,
+               x0=None, wait=None, timeout=None):
+    """run the optimiser keeping the solver in memory
+
+    Instead of exiting when a run is required the launcher is called
+    to start the job and the optimiser blocks until the result
+    becomes available.
+
+    :param config: the model optimisation configuration
+    :param launcher: callable that starts a job for a new run
+    :param poll: maximum time in seconds between checking the objective
+                 function for results
+    :param x0: the starting point, defaults to the initial values
+    :param wait: callable taking a timeout that blocks until a result
+                 may be available, by default wait for the result to be
+                 signalled by the postprocessing. It may raise an
+                 exception to stop the optimiser, eg if a job failed.
+    :param timeout: the maximum time in seconds to wait for the result
+                    of a parameter set, no limit if None
+    :raises TimeoutError: if a result does not arrive in time
+    """
+    if wait is None:
+        def wait(timeout):
+            wait_for_result(config, timeout)
+
+    def blocking_residual(x, **kwargs):
+        deadline = _deadline(timeout)
         while True:
-            try:
-                x = run_opt(config)
-                break
-            except ObjectiveFunction_client.NewRun:
-                num_tasks += 1
-            except ObjectiveFunction_client.Waiting:
-                waiting = True
-                break
+            r = _try_residual(config, x, launcher, **kwargs)
+            if r is not None:
+                return r
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'no result for {x} after {timeout} '
+                                   'seconds')
+            with config.instrument.timer('wait'):
+                wait(poll)
+
+    if x0 is None:
+        x0 = initial_values(config)
+    if checkpoint is not None:
+        checkpoint.rewind()
+    with config.instrument.timer('solve'):
+        soln = solve(
+            lambda x: blocking_residual(x, checkpoint=checkpoint,
+                                        cache=cache),
+            numpy.array(x0, dtype=float),
+            bounds=(
+                config.objectiveFunction.lower_bounds,
+                config.objectiveFunction.upper_bounds),
+            rhobeg=RHOBEG,
+            scaling_within_bounds=True
+        )
+    return soln
+
+
+def generate_all(config, checkpoint=None, cache=None, x0=None):
+    """run the optimiser until it has to wait for results
+
+    :param config: the model optimisation configuration
+    :param x0: the starting point, defaults to the initial values
+    :return: the optimum, the number of new runs and whether the
+             optimiser is waiting for results
+    """
+    num_tasks = 0
+    while True:
+        try:
+            x = run_opt(config, checkpoint=checkpoint, cache=cache, x0=x0)
+            return x, num_tasks, False
+        except ObjectiveFunction_client.NewRun:
+            num_tasks += 1
+        except ObjectiveFunction_client.Waiting:
+            return None, num_tasks, True
+
+
+def _main_daemon(args, config, checkpoint, cache, x0):
+    launcher = CommandLauncher(args.launch, args.config)
+
+    def wait(timeout):
+        wait_for_result(config, timeout)
+        # give up if a job failed, its result would never arrive
+        launcher.check()
+
+    if args.batch:
+        for i in range(submit_initial_design(config, x0=x0)):
+            launcher()
+    x = run_daemon(config, launcher, poll=args.poll,
+                   checkpoint=checkpoint, cache=cache, x0=x0,
+                   wait=wait, timeout=args.timeout)
+    if launcher.running > 0:
+        logging.info(f'waiting for {launcher.running} jobs to finish')
+        launcher.wait()
+    return x
+
+
+def _main_step(args, config, checkpoint, cache, x0):
+    # run the optimiser until it needs a new run, the exit code
+    # signals the state to the workflow
+    if args.batch:
+        num_tasks = submit_initial_design(config, x0=x0)
+        if num_tasks > 0:
+            print(num_tasks)
+            sys.exit(3)
+
+    if args.generate_all:
+        x, num_tasks, waiting = generate_all(config, checkpoint=checkpoint,
+                                             cache=cache, x0=x0)
         if waiting:
             print(num_tasks)
             sys.exit(3)
     else:
         try:
-            x = run_opt(config)
+            x = run_opt(config, checkpoint=checkpoint, cache=cache, x0=x0)
         except ObjectiveFunction_client.NewRun:
             print('new')
             sys.exit(1)
         except ObjectiveFunction_client.Waiting:
             print('waiting')
             sys.exit(2)
+    return x
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', type=Path,
+                        help="name of configuration file")
+    parser.add_argument('-g', '--generate-all', action='store_true',
+                        default=False, help="generate all tasks")
+    parser.add_argument('-b', '--batch', action='store_true',
+                        default=False,
+                        help="create runs for all initial points at once")
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        default=False,
+                        help="replay all evaluations from the server "
+                        "rather than the checkpoint")
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help="do not use the local cache of completed runs")
+    parser.add_argument('-D', '--daemon', action='store_true',
+                        default=False,
+                        help="keep running and launch jobs for new runs")
+    parser.add_argument('-l', '--launch',
+                        help="command used to launch a job that configures, "
+                        "runs and postprocesses a new run in daemon mode, "
+                        "{config} is replaced with the name of the "
+                        "configuration file, eg "
+                        "'workflows/shell/configure.sh {config}'")
+    parser.add_argument('-S', '--surrogate', type=float, const=0.,
+                        nargs='?', metavar='KAPPA',
+                        help="start a new optimisation from the point an "
+                        "emulator trained on the completed runs predicts "
+                        "to be best, the prediction is made KAPPA standard "
+                        "deviations more optimistic, default 0")
+    parser.add_argument('-p', '--poll', type=float, default=60.,
+                        help="maximum time in seconds between checks for "
+                        "results in daemon mode, results that are not "
+                        "signalled by the postprocessing are found after "
+                        "this time")
+    parser.add_argument('-t', '--timeout', type=float, metavar='SECONDS',
+                        help="give up if the result of a parameter set "
+                        "does not arrive within SECONDS seconds in daemon "
+                        "mode")
+    args = parser.parse_args()
+
+    if args.daemon and args.launch is None:
+        parser.error('daemon mode needs the command launching the jobs')
+
+    config = ModelOptimisationConfig(args.config)
+
+    if args.no_cache:
+        cache = None
+    else:
+        cache = config.resultCache
+    if args.no_checkpoint:
+        checkpoint = None
+    else:
+        checkpoint = load_checkpoint(config, cache=cache)
+
+    if args.surrogate is not None:
+        if checkpoint is None or cache is None:
+            parser.error('the surrogate needs the checkpoint and the cache')
+        surrogate = load_surrogate(config, cache, args.surrogate)
+    else:
+        surrogate = None
+    x0 = start_point(config, surrogate=surrogate)
+
+    if args.daemon:
+        x = _main_daemon(args, config, checkpoint, cache, x0)
+    else:
+        x = _main_step(args, config, checkpoint, cache, x0)
 
     logging.info(f"optimum at {x}")
     print('done')
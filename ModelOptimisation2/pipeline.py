@@ -0,0 +1,178 @@
+__all__ = ['Pipeline']
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import logging
+from pathlib import Path
+import shutil
+from typing import Any, Callable, Mapping, Optional, Sequence
+import ObjectiveFunction_client
+
+from .config import ModelOptimisationConfig
+from .model_config import configure, claim_new_runs
+from .optimise import run_daemon, submit_initial_design, wait_for_result
+
+# the states a run passes through once it has been configured
+RUN_STATES = [ObjectiveFunction_client.LookupState.CONFIGURED,
+              ObjectiveFunction_client.LookupState.ACTIVE,
+              ObjectiveFunction_client.LookupState.RUN,
+              ObjectiveFunction_client.LookupState.POSTPROCESSING]
+
+
+class Pipeline:
+    """drive the configure, run and postprocess loop in a single process
+
+    New runs requested by the optimiser are configured, run and
+    postprocessed by a pool of worker threads while the optimiser
+    waits for the results. The worker threads do not call the
+    ObjectiveFunction server. New runs are claimed with concurrent
+    requests made by the threads of the asynchronous client, all other
+    calls to the server are made from the calling thread.
+
+    :param config: the model optimisation configuration
+    :param runner: callable taking the model directory that runs the model
+    :param extractor: callable taking the model directory and the
+                      observation names that returns the simulated
+                      observations
+    :param workers: the number of runs processed concurrently
+    :param clonedir: the model setup to clone, defaults to the clone
+                     directory of the configuration
+    :param clone_mode: how to clone the model setup, defaults to the
+                       clone mode of the configuration
+    :param retries: the number of times a failed run is processed again
+                    before the pipeline gives up
+    """
+
+    def __init__(self, config: ModelOptimisationConfig,
+                 runner: Callable[[Path], Any],
+                 extractor: Callable[[Path, Sequence[str]], Mapping],
+                 workers: Optional[int] = None,
+                 clonedir: Optional[Path] = None,
+                 clone_mode: Optional[str] = None,
+                 retries: int = 1):
+        """constructor"""
+        self._config = config
+        self._runner = runner
+        self._extractor = extractor
+        self._workers = workers
+        if clonedir is None:
+            clonedir = config.cloneDir
+        if clonedir is None:
+            raise RuntimeError('no clone directory specified')
+        self._clonedir = clonedir
+        if clone_mode is None:
+            clone_mode = config.cloneMode
+        self._clone_mode = clone_mode
+        self._retries = retries
+
+        self._executor = None
+        self._futures = {}
+        self._failures = {}
+
+    @property
+    def config(self) -> ModelOptimisationConfig:
+        return self._config
+
+    @property
+    def pending(self) -> int:
+        """the number of runs being processed"""
+        return len(self._futures)
+
+    def process(self, runid: int, params: Mapping[str, Any]) -> Mapping:
+        """configure, run and postprocess a single run
+
+        :param runid: the ID of the run
+        :param params: a dictionary containing parameter names and values
+        :return: the simulated observations
+        """
+        modeldir = configure(self.config, self._clonedir, self._clone_mode,
+                             runid, params)
+        with self.config.instrument.timer('run', runid=runid):
+            self._runner(modeldir)
+        with self.config.instrument.timer('extract', runid=runid):
+            return self._extractor(modeldir, list(self.config.cfg['targets']))
+
+    def launch(self, num_runs: int = 1) -> int:
+        """start processing new runs
+
+        :param num_runs: the maximum number of runs to start
+        :return: the number of runs started
+        """
+        if self._executor is None:
+            raise RuntimeError('pipeline is not running')
+        runs = claim_new_runs(self.config, num_runs)
+        for runid, params in runs:
+            self._submit(runid, params)
+        return len(runs)
+
+    def _submit(self, runid, params):
+        future = self._executor.submit(self.process, runid, params)
+        self._futures[future] = (runid, params)
+
+    def _retry(self, runid, params):
+        failures = self._failures.get(runid, 0) + 1
+        self._failures[runid] = failures
+        if failures > self._retries:
+            raise RuntimeError(f'run {runid} failed {failures} times')
+        logging.info(f'processing run {runid} again')
+        try:
+            shutil.rmtree(self.config.modelDir(runid))
+        except RuntimeError:
+            # the run failed before its model directory was created
+            pass
+        self._submit(runid, params)
+
+    def wait(self, timeout: float = 60.) -> int:
+        """wait for at least one run to finish and upload the results
+
+        A run that failed is logged and processed again while the
+        other runs carry on. If it fails more often than the number of
+        retries a RuntimeError is raised.
+
+        :param timeout: the maximum time to wait in seconds
+        :return: the number of results uploaded
+        """
+        if len(self._futures) == 0:
+            # the results are produced elsewhere
+            wait_for_result(self.config, timeout)
+            return 0
+        done, not_done = wait(self._futures, timeout=timeout,
+                              return_when=FIRST_COMPLETED)
+        uploaded = 0
+        for future in done:
+            runid, params = self._futures.pop(future)
+            try:
+                simobs = future.result()
+            except Exception:
+                logging.exception(f'failed to process run {runid}')
+                self._retry(runid, params)
+                continue
+            for state in RUN_STATES:
+                self.config.objectiveFunction.setState(runid, state)
+            self.config.objectiveFunction.set_result(params, simobs)
+            uploaded += 1
+        if uploaded > 0:
+            self.config.notifyResult()
+        return uploaded
+
+    def run(self, batch: bool = False, checkpoint=None, cache=None,
+            x0=None):
+        """run the optimiser until it converges
+
+        :param batch: create runs for all initial points at once
+        :param checkpoint: the optimiser checkpoint
+        :param cache: the local cache of completed runs
+        :param x0: the starting point, defaults to the initial values
+        :return: the optimum
+        """
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            self._executor = executor
+            try:
+                if batch:
+                    self.launch(submit_initial_design(self.config, x0=x0))
+                return run_daemon(self.config, self.launch,
+                                  checkpoint=checkpoint, cache=cache,
+                                  x0=x0, wait=self.wait)
+            finally:
+                self._executor = None
+                self._futures = {}
+                self._failures = {}
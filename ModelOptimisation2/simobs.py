@@ -0,0 +1,87 @@
+__all__ = ['SimObsExtractor']
+
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+import numpy
+import pandas
+import xarray
+
+
+class SimObsExtractor:
+    """extract simulated observations from gridded model output
+
+    The locations of the observations are given relative to the extent
+    of the grid. The indices of the grid points nearest to the
+    observations are computed once per grid and all observations are
+    read with a single selection. Only the required grid points are
+    read from the file.
+
+    :param coords: dictionary mapping observation names to x and y
+                   coordinates relative to the extent of the grid
+    :param variable: the name of the variable containing the data
+    :param xdim: the name of the x dimension
+    :param ydim: the name of the y dimension
+    """
+
+    def __init__(self, coords: Dict[str, Tuple[float, float]],
+                 variable: str = 'z', xdim: str = 'x', ydim: str = 'y'):
+        """constructor"""
+        self._coords = coords
+        self._variable = variable
+        self._xdim = xdim
+        self._ydim = ydim
+        self._grid = None
+        self._indices = {}
+
+    @staticmethod
+    def _nearest(coord, relative):
+        # same arithmetic and nearest neighbour lookup as
+        # coord.sel(..., method='nearest')
+        target = float(coord[0]) + float(coord[-1] - coord[0]) * relative
+        return pandas.Index(coord).get_indexer(target, method='nearest')
+
+    def indices(self, x: numpy.ndarray, y: numpy.ndarray,
+                names: Sequence[str]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """the grid indices of the observations
+
+        :param x: the x coordinates of the grid
+        :param y: the y coordinates of the grid
+        :param names: the names of the observations
+        """
+        if self._grid is None or \
+           not numpy.array_equal(self._grid[0], x) or \
+           not numpy.array_equal(self._grid[1], y):
+            self._grid = (x, y)
+            self._indices = {}
+        names = tuple(names)
+        if names not in self._indices:
+            relative = numpy.array([self._coords[n] for n in names],
+                                   dtype=float).reshape(-1, 2)
+            self._indices[names] = (self._nearest(x, relative[:, 0]),
+                                    self._nearest(y, relative[:, 1]))
+        return self._indices[names]
+
+    def extract_dataset(self, data: xarray.Dataset,
+                        names: Sequence[str]) -> pandas.Series:
+        """extract the simulated observations from a dataset
+
+        :param data: the dataset
+        :param names: the names of the observations
+        """
+        names = list(names)
+        ix, iy = self.indices(data[self._xdim].values,
+                              data[self._ydim].values, names)
+        values = data[self._variable].isel(
+            {self._xdim: xarray.DataArray(ix, dims='obs'),
+             self._ydim: xarray.DataArray(iy, dims='obs')}).values
+        return pandas.Series(values.astype(float), index=names)
+
+    def extract(self, data_file: Path,
+                names: Sequence[str]) -> pandas.Series:
+        """extract the simulated observations from a netCDF file
+
+        :param data_file: the name of the netCDF file
+        :param names: the names of the observations
+        """
+        with xarray.open_dataset(data_file) as data:
+            return self.extract_dataset(data, names)
@@ -1,11 +1,13 @@
 import argparse
+import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import xarray
-import pandas
+import sys
 import ObjectiveFunction_client
 
 from .config import ModelOptimisationConfig
+from .simobs import SimObsExtractor
 
 
 COORDS = {'sim0': [0.1, 0.1],
@@ -14,6 +16,83 @@ COORDS = {'sim0': [0.1, 0.1],
           'sim3': [0.5, 0.1],
           'sim4': [0.5, 0.9]}
 
+EXTRACTOR = SimObsExtractor(COORDS)
+
+
+def extract(data_file, names):
+    return EXTRACTOR.extract(data_file, names)
+
+
+def claim_runs(config):
+    """claim all runs in RUN state for postprocessing
+
+    The runs are claimed with concurrent requests to the server.
+
+    :param config: the model optimisation configuration
+    :return: a list of run ID, parameter tuples
+    """
+    objfun = config.asyncObjectiveFunction
+    return objfun.run(objfun.claim(
+        ObjectiveFunction_client.LookupState.RUN,
+        ObjectiveFunction_client.LookupState.POSTPROCESSING))
+
+
+async def _postprocess_runs(config, runs, executor):
+    names = list(config.cfg['targets'])
+
+    async def postprocess_run(runid, params):
+        try:
+            data_file = config.modelDir(runid) / 'results.nc'
+            timed_extract = config.instrument.wrap(extract, 'extract',
+                                                   runid=runid)
+            simobs = await asyncio.wrap_future(
+                executor.submit(timed_extract, data_file, names))
+            await config.asyncObjectiveFunction.set_result(params, simobs)
+        except Exception:
+            logging.exception(f'failed to postprocess run {runid}')
+            await _release(runid)
+            return runid
+        config.notifyResult()
+
+    async def _release(runid):
+        # hand the run back so that it can be postprocessed again
+        try:
+            await config.asyncObjectiveFunction.setState(
+                runid, ObjectiveFunction_client.LookupState.RUN)
+        except Exception:
+            logging.exception(f'failed to reset run {runid}')
+
+    return await asyncio.gather(*[postprocess_run(runid, params)
+                                  for runid, params in runs])
+
+
+def postprocess_all(config, runs, workers=None):
+    """extract simulated observations of runs in a process pool
+
+    The results are uploaded concurrently as they become available.
+    Runs that could not be postprocessed are moved back to the RUN
+    state.
+
+    :param config: the model optimisation configuration
+    :param runs: a list of run ID, parameter tuples
+    :param workers: the number of worker processes
+    :return: a list of the IDs of the runs that failed
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        failed = asyncio.run(_postprocess_runs(config, runs, executor))
+    return sorted(runid for runid in failed if runid is not None)
+
+
+def _main_all(parser, args, config):
+    runs = claim_runs(config)
+    if len(runs) == 0:
+        parser.error('no runs to postprocess')
+    failed = postprocess_all(config, runs, workers=args.workers)
+    if len(failed) > 0:
+        runids = ','.join(str(runid) for runid in failed)
+        logging.error(f'failed to postprocess runs {runids}')
+        sys.exit(1)
+
 
 def main():
     logging.basicConfig(level=logging.INFO)
@@ -23,12 +102,25 @@ def main():
                         help="name of configuration file")
     parser.add_argument('-d', '--data-file', type=Path,
                         help="name of netCDF file to read data from")
+    parser.add_argument('-a', '--all', action='store_true', default=False,
+                        help="postprocess all runs in RUN state")
+    parser.add_argument('-w', '--workers', type=int, metavar='K',
+                        help="number of runs to postprocess concurrently "
+                        "when postprocessing all runs")
     args = parser.parse_args()
 
+    if args.all and args.data_file is not None:
+        parser.error('cannot postprocess all runs and a data file')
+
     config = ModelOptimisationConfig(args.config)
 
+    if args.all:
+        _main_all(parser, args, config)
+        return
+
     if args.data_file is not None:
         data_file = args.data_file
+        runid = None
     else:
         try:
             runid, params = config.objectiveFunction.get_with_state(
@@ -39,21 +131,14 @@ def main():
         modeldir = config.modelDir(runid)
         data_file = modeldir / 'results.nc'
 
-    data = xarray.open_dataset(data_file)
-    simobs = {}
-    for obs in config.cfg['targets']:
-        x, y = COORDS[obs]
-        x = float(data.x[0]) + float(data.x[-1] - data.x[0]) * x
-        y = float(data.y[0]) + float(data.y[-1] - data.y[0]) * y
-        z = float(data.z.sel(x=x, y=y, method='nearest'))
-        simobs[obs] = z
-
-    simobs = pandas.Series(simobs)
+    with config.instrument.timer('extract', runid=runid):
+        simobs = extract(data_file, config.cfg['targets'])
 
     if args.data_file is not None:
         print(simobs)
     else:
         config.objectiveFunction.set_result(params, simobs)
+        config.notifyResult()
 
 
 if __name__ == '__main__':
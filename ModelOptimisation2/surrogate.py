@@ -0,0 +1,212 @@
+__all__ = ['GaussianProcess', 'Surrogate']
+
+import logging
+from typing import Optional, Tuple
+import numpy
+
+# length scales, relative to the bounds, tried when fitting the emulator
+LENGTH_SCALES = numpy.geomspace(0.05, 5., 25)
+
+
+class GaussianProcess:
+    """Gaussian process emulator of the simulated observations
+
+    The parameters are scaled to the unit cube by the bounds. All
+    observations share a squared exponential kernel whose length
+    scale is chosen by maximising the marginal likelihood. Each
+    observation has its own mean and variance.
+
+    :param lower: the lower bounds of the parameters
+    :param upper: the upper bounds of the parameters
+    :param nugget: the relative noise added to the diagonal of the kernel
+    """
+
+    def __init__(self, lower, upper, nugget: float = 1e-8):
+        """constructor"""
+        self._lower = numpy.asarray(lower, dtype=float)
+        self._scale = numpy.asarray(upper, dtype=float) - self._lower
+        self._nugget = nugget
+        self._x = []
+        self._y = []
+        self._fit = None
+
+    def __len__(self):
+        return len(self._x)
+
+    @property
+    def length_scale(self) -> float:
+        self.fit()
+        return self._fit['length_scale']
+
+    def add(self, x, y) -> None:
+        """add a training point
+
+        :param x: the parameter values
+        :param y: the simulated observations
+        """
+        self._x.append(self._normalise(x))
+        self._y.append(numpy.asarray(y, dtype=float))
+        self._fit = None
+
+    def _normalise(self, x):
+        return (numpy.asarray(x, dtype=float) - self._lower) / self._scale
+
+    @staticmethod
+    def _sqdist(a, b):
+        return ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+
+    def _factor(self, d2, length_scale):
+        kernel = numpy.exp(-0.5 * d2 / length_scale ** 2)
+        kernel[numpy.diag_indices_from(kernel)] += self._nugget
+        return numpy.linalg.cholesky(kernel)
+
+    def fit(self) -> None:
+        """fit the emulator to the training points"""
+        if self._fit is not None:
+            return
+        if len(self) < 2:
+            raise RuntimeError('need at least two training points')
+        x = numpy.array(self._x)
+        y = numpy.array(self._y)
+        mean = y.mean(axis=0)
+        y = y - mean
+        d2 = self._sqdist(x, x)
+        best = None
+        for length_scale in LENGTH_SCALES:
+            try:
+                chol = self._factor(d2, length_scale)
+            except numpy.linalg.LinAlgError:
+                continue
+            alpha = numpy.linalg.solve(
+                chol.T, numpy.linalg.solve(chol, y))
+            # the variances of the observations maximising the likelihood
+            variance = numpy.maximum((y * alpha).sum(axis=0) / len(x),
+                                     1e-300)
+            loglike = -0.5 * len(x) * numpy.log(variance).sum() - \
+                y.shape[1] * numpy.log(numpy.diag(chol)).sum()
+            if best is None or loglike > best[0]:
+                best = (loglike, length_scale, chol, alpha, variance)
+        if best is None:
+            raise RuntimeError('could not fit emulator')
+        loglike, length_scale, chol, alpha, variance = best
+        self._fit = {'x': x, 'mean': mean, 'length_scale': length_scale,
+                     'chol': chol, 'alpha': alpha, 'variance': variance}
+
+    def predict(self, x) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """predict the simulated observations
+
+        :param x: the parameter values, or an array of shape (m, n) of m
+                  parameter sets
+        :return: the predicted mean and standard deviation of the
+                 simulated observations
+        """
+        self.fit()
+        fit = self._fit
+        x = numpy.asarray(x, dtype=float)
+        points = self._normalise(numpy.atleast_2d(x))
+        d2 = self._sqdist(points, fit['x'])
+        k = numpy.exp(-0.5 * d2 / fit['length_scale'] ** 2)
+        v = numpy.linalg.solve(fit['chol'], k.T)
+        mean = fit['mean'] + k @ fit['alpha']
+        shrink = numpy.maximum(1. - (v * v).sum(axis=0), 0.)
+        std = numpy.sqrt(fit['variance'] * shrink[:, None])
+        if x.ndim == 1:
+            return mean[0], std[0]
+        return mean, std
+
+
+class Surrogate:
+    """propose the start of the optimiser with an emulator
+
+    The emulator is trained on the completed runs. It proposes the
+    point whose optimistic prediction is best among the completed runs
+    and random candidates within the bounds. The predictions are never
+    given to the optimiser, they only decide where it starts.
+
+    :param lower: the lower bounds of the parameters
+    :param upper: the upper bounds of the parameters
+    :param targets: the target values of the observations
+    :param kappa: the number of standard deviations of the optimistic
+                  prediction
+    :param min_points: the minimum number of training points before the
+                       emulator is used, defaults to twice the number of
+                       parameters plus one
+    """
+
+    def __init__(self, lower, upper, targets, kappa: float = 0.,
+                 min_points: Optional[int] = None):
+        """constructor"""
+        self._lower = numpy.asarray(lower, dtype=float)
+        self._upper = numpy.asarray(upper, dtype=float)
+        self._gp = GaussianProcess(lower, upper)
+        self._targets = numpy.asarray(targets, dtype=float)
+        self._kappa = kappa
+        if min_points is None:
+            min_points = 2 * len(numpy.atleast_1d(lower)) + 1
+        self._min_points = max(min_points, 2)
+        self._points = set()
+
+    @classmethod
+    def from_cache(cls, cache, lower, upper, targets, **kwargs):
+        """create a surrogate trained on the completed runs of a cache
+
+        :param cache: the local cache of completed runs
+        :param lower: the lower bounds of the parameters
+        :param upper: the upper bounds of the parameters
+        :param targets: the target values of the observations
+        """
+        surrogate = cls(lower, upper, targets, **kwargs)
+        for x, obs in cache.items():
+            surrogate.add(x, obs)
+        return surrogate
+
+    def __len__(self):
+        return len(self._gp)
+
+    def cost(self, obs) -> float:
+        """the sum of squared residuals
+
+        :param obs: the simulated observations
+        """
+        return float(((numpy.asarray(obs) - self._targets) ** 2).sum())
+
+    def add(self, x, obs) -> None:
+        """train the emulator with the result of a model run
+
+        Points the emulator has already been trained with are ignored.
+
+        :param x: the parameter values
+        :param obs: the simulated observations
+        """
+        key = tuple(numpy.asarray(x, dtype=float).tolist())
+        if key in self._points:
+            return
+        self._points.add(key)
+        self._gp.add(x, obs)
+
+    def propose(self, num_candidates: int = 1000,
+                seed: int = 0) -> Optional[numpy.ndarray]:
+        """the most promising point to start the optimiser from
+
+        :param num_candidates: the number of random candidates
+        :param seed: the seed of the random candidates
+        :return: the parameter values or None if the emulator is not
+                 available
+        """
+        if len(self) < self._min_points:
+            return None
+        rng = numpy.random.default_rng(seed)
+        candidates = numpy.concatenate([
+            numpy.array(sorted(self._points)),
+            rng.uniform(self._lower, self._upper,
+                        (num_candidates, len(self._lower)))])
+        try:
+            mean, std = self._gp.predict(candidates)
+        except RuntimeError as e:
+            logging.warning(f'emulator not available: {e}')
+            return None
+        optimistic = numpy.maximum(
+            numpy.abs(mean - self._targets) - self._kappa * std, 0.)
+        best = candidates[(optimistic ** 2).sum(axis=1).argmin()]
+        logging.info(f'emulator proposes to start from {best}')
+        return best
@@ -1,6 +1,8 @@
 import argparse
+from functools import partial
 import logging
 from pathlib import Path
+import sys
 import ObjectiveFunction_client
 
 from .config import ModelOptimisationConfig
@@ -8,6 +10,153 @@ from .config import ModelOptimisationConfig
 STATES = ObjectiveFunction_client.LookupState._member_names_
 
 
+def parse_ids(spec):
+    """parse a list of run IDs and ranges of run IDs, eg 1-5,8
+
+    :param spec: comma separated list of IDs and ranges
+    :return: sorted list of run IDs
+    """
+    runids = set()
+    try:
+        for item in spec.split(','):
+            first, sep, last = item.partition('-')
+            if sep:
+                if int(last) < int(first):
+                    raise ValueError
+                runids.update(range(int(first), int(last) + 1))
+            else:
+                runids.add(int(first))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid run IDs {spec}')
+    return sorted(runids)
+
+
+def _transition(objfun, runid, current_state, new_state):
+    # the state is checked and changed in one step of the same worker
+    state = objfun.getState(runid)
+    if state != current_state:
+        raise RuntimeError(f'wrong state {state.name}')
+    objfun.setState(runid, new_state)
+
+
+def transition_run(config, runid, current_state, new_state):
+    """move a run in current state to a new state
+
+    The state of a run with a model directory is changed while holding
+    the lock of the run. Runs pruned by mo2-monitor are not moved.
+
+    :param config: the model optimisation configuration
+    :param runid: the ID of the run
+    :param current_state: the current state of the run
+    :param new_state: the new state
+    """
+    objfun = config.objectiveFunction
+    try:
+        modeldir = config.modelDir(runid)
+    except RuntimeError:
+        # a run without model directory is not running
+        _transition(objfun, runid, current_state, new_state)
+        return
+    with config.lockRun(runid):
+        if (modeldir / config.PRUNED).exists():
+            raise RuntimeError('pruned by mo2-monitor')
+        _transition(objfun, runid, current_state, new_state)
+
+
+def transition_runs(config, runids, current_state, new_state):
+    """move runs in current state to a new state
+
+    The state of each run is checked and changed in one step. Runs that
+    are not in the current state are left unchanged.
+
+    :param config: the model optimisation configuration
+    :param runids: the IDs of the runs
+    :param current_state: the current state of the runs
+    :param new_state: the new state
+    :return: the sorted IDs of the runs that were moved and a list of
+             problems
+    """
+    objfun = config.asyncObjectiveFunction
+    results = objfun.run(objfun.map(
+        partial(_transition, current_state=current_state,
+                new_state=new_state), runids))
+    moved = []
+    problems = []
+    for runid, result in zip(runids, results):
+        if isinstance(result, LookupError):
+            problems.append(f'no run with ID {runid}')
+        elif isinstance(result, Exception):
+            problems.append(f'run {runid}: {result}')
+        else:
+            moved.append(runid)
+    return sorted(moved), problems
+
+
+def claim_runs(config, current_state, new_state, num_runs=None):
+    """move runs in current state to a new state
+
+    :param config: the model optimisation configuration
+    :param current_state: the current state of the runs
+    :param new_state: the new state
+    :param num_runs: the maximum number of runs, all runs if None
+    :return: the sorted IDs of the runs
+    """
+    objfun = config.asyncObjectiveFunction
+    runs = objfun.run(objfun.claim(current_state, new_state,
+                                   num_runs=num_runs))
+    return sorted(runid for runid, params in runs)
+
+
+def _main_bulk(parser, args, config, current_state, new_state):
+    problems = []
+    with config.instrument.timer('transition'):
+        if args.ids is not None:
+            runids, problems = transition_runs(config, args.ids,
+                                               current_state, new_state)
+        else:
+            runids = claim_runs(config, current_state, new_state,
+                                num_runs=args.limit)
+    if args.ids is None and len(runids) == 0:
+        parser.error(f'no runs in state {current_state.name}')
+
+    for runid in runids:
+        try:
+            print(config.modelDir(runid))
+        except RuntimeError as e:
+            logging.error(f'run {runid}: {e}')
+    for problem in problems:
+        logging.error(problem)
+    if len(problems) > 0:
+        sys.exit(1)
+
+
+def _main_single(parser, args, config, current_state, new_state):
+    if args.runid is not None:
+        if args.runid == -1:
+            runid = int(config.RUNID.read_text())
+        else:
+            runid = args.runid
+        try:
+            with config.instrument.timer('transition', runid=runid):
+                transition_run(config, runid, current_state, new_state)
+        except LookupError:
+            parser.error(f'no run with ID {runid}')
+        except RuntimeError as e:
+            parser.error(f'run {runid}: {e}')
+    else:
+        try:
+            with config.instrument.timer('transition') as record:
+                runid, params = config.objectiveFunction.get_with_state(
+                    current_state, with_id=True, new_state=new_state)
+                record['runid'] = runid
+        except LookupError as e:
+            parser.error(e)
+
+        modeldir = config.modelDir(runid)
+
+        print(modeldir)
+
+
 def main():
     logging.basicConfig(level=logging.INFO)
 
@@ -18,41 +167,37 @@ def main():
                         help="select current state")
     parser.add_argument('new', choices=STATES,
                         help="select new state")
-    parser.add_argument('-i', '--runid', type=int, const=-1, nargs='?',
+    select = parser.add_mutually_exclusive_group()
+    select.add_argument('-i', '--runid', type=int, const=-1, nargs='?',
                         help="change state of run with ID. "
                         "If no ID is specified read it from objfun.runid")
+    select.add_argument('-a', '--all', action='store_true', default=False,
+                        help="change state of all runs in current state")
+    select.add_argument('-I', '--ids', type=parse_ids,
+                        help="change state of runs with IDs, "
+                        "eg 1-200,205. Runs not in current state are reported "
+                        "and left unchanged")
+    select.add_argument('-n', '--limit', type=int, metavar='N',
+                        help="change state of up to N runs in current state")
+    parser.add_argument('-f', '--force', action='store_true', default=False,
+                        help="allow moving runs back to an earlier state")
     args = parser.parse_args()
 
     current_state = ObjectiveFunction_client.LookupState[args.current]
     new_state = ObjectiveFunction_client.LookupState[args.new]
 
-    if new_state.value <= current_state.value:
+    if new_state == current_state or \
+       (new_state.value < current_state.value and not args.force):
         parser.error('new state must follow current state')
+    if args.limit is not None and args.limit < 1:
+        parser.error('limit must be positive')
 
     config = ModelOptimisationConfig(args.config)
 
-    if args.runid is not None:
-        if args.runid == -1:
-            runid = int(config.RUNID.read_text())
-        else:
-            runid = args.runid
-        try:
-            state = config.objectiveFunction.getState(runid)
-        except LookupError:
-            parser.error(f'no run with ID {runid}')
-        if state != current_state:
-            parser.error(f'run is in wrong state {state.name}')
-        config.objectiveFunction.setState(runid, new_state)
+    if args.all or args.ids is not None or args.limit is not None:
+        _main_bulk(parser, args, config, current_state, new_state)
     else:
-        try:
-            runid, params = config.objectiveFunction.get_with_state(
-                current_state, with_id=True, new_state=new_state)
-        except LookupError as e:
-            parser.error(e)
-
-        modeldir = config.modelDir(runid)
-
-        print(modeldir)
+        _main_single(parser, args, config, current_state, new_state)
 
 
 if __name__ == '__main__':
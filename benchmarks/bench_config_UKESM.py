@@ -0,0 +1,49 @@
+import pytest
+import shutil
+
+from ModelOptimisation2.config_UKESM import UKESM, _process_config
+
+from conftest import make_rose_conf
+
+CONF = 'app/um/rose-app.conf'
+
+
+def make_parameters(num_sections, num_keys):
+    # set every other key in every other section
+    return {f'section{s:04d}': {f'key{k:03d}': s + k
+                                for k in range(0, num_keys, 2)}
+            for s in range(0, num_sections, 2)}
+
+
+@pytest.mark.benchmark(group='process_config')
+@pytest.mark.parametrize('num_sections', [10, 100, 1000])
+def test_process_config(benchmark, throughput, tmp_path, num_sections):
+    make_rose_conf(tmp_path / 'rose-app.conf', num_sections, 20)
+    config = (tmp_path / 'rose-app.conf').read_text()
+    parameters = make_parameters(num_sections, 20)
+
+    benchmark(_process_config, config, parameters)
+    throughput(parameters=sum(len(p) for p in parameters.values()))
+
+
+@pytest.mark.benchmark(group='write_params_UKESM')
+@pytest.mark.parametrize('num_sections', [100, 1000])
+def test_write_params(benchmark, throughput, tmp_path, num_sections):
+    template = tmp_path / 'rose-app.conf'
+    make_rose_conf(template, num_sections, 20)
+    modeldir = tmp_path / 'model'
+    (modeldir / CONF).parent.mkdir(parents=True)
+    model = UKESM(modeldir)
+    params = {'iau_nontrop_max_p': 40000.,
+              'diagcloud_qn_compregimelimit': 20.,
+              'DP_CORR_STRAT': 2.,
+              'TWO_D_FSD_FACTOR': 1.5,
+              'ENT_FAC_DP': 1.,
+              'AI': 0.02}
+
+    def reset():
+        shutil.copy(template, modeldir / CONF)
+
+    benchmark.pedantic(model.write_params, args=(params,), setup=reset,
+                       rounds=20, warmup_rounds=1)
+    throughput(parameters=len(params))
@@ -0,0 +1,19 @@
+import pytest
+import subprocess
+import sys
+
+# the modules imported by the lightweight commands
+MODULES = ['ModelOptimisation2.transition',
+           'ModelOptimisation2.model_config',
+           'ModelOptimisation2.write_config']
+
+
+@pytest.mark.benchmark(group='imports')
+@pytest.mark.parametrize('module', MODULES)
+def test_import(benchmark, module):
+    # the command start up time including the interpreter
+    def run():
+        subprocess.run([sys.executable, '-c', f'import {module}'],
+                       check=True)
+
+    benchmark.pedantic(run, rounds=5, warmup_rounds=1)
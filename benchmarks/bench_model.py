@@ -0,0 +1,56 @@
+import pytest
+import shutil
+
+from conftest import make_namelist, make_model, make_params
+
+NUM_KEYS = 20
+
+
+@pytest.fixture
+def template(tmp_path):
+    def make(num_groups):
+        clone = tmp_path / 'clone'
+        clone.mkdir()
+        make_namelist(clone / 'big.nml', num_groups, NUM_KEYS)
+        return clone
+    return make
+
+
+@pytest.mark.benchmark(group='process_params')
+@pytest.mark.parametrize('num_groups', [1, 10, 100])
+def test_process_params(benchmark, throughput, rng, num_groups):
+    model = make_model('big.nml', num_groups, NUM_KEYS)('.')
+    params = make_params(model, rng)
+
+    benchmark(model.process_params, params)
+    throughput(parameters=len(params))
+
+
+@pytest.mark.benchmark(group='process_params_many')
+@pytest.mark.parametrize('num_runs', [10, 100, 1000])
+def test_process_params_many(benchmark, throughput, rng, num_runs):
+    model = make_model('big.nml', 10, NUM_KEYS)('.')
+    params_list = [make_params(model, rng) for i in range(num_runs)]
+
+    benchmark(model.process_params_many, params_list)
+    throughput(runs=num_runs, parameters=len(model.NAMELIST_MAP))
+
+
+@pytest.mark.benchmark(group='write_params')
+@pytest.mark.parametrize('use_template', [False, True])
+@pytest.mark.parametrize('num_groups', [10, 100])
+def test_write_params(benchmark, throughput, rng, tmp_path, template,
+                      num_groups, use_template):
+    clone = template(num_groups)
+    modeldir = tmp_path / 'model'
+    modeldir.mkdir()
+    model_class = make_model('big.nml', num_groups, NUM_KEYS)
+    model = model_class(modeldir, clone=clone if use_template else None)
+    params = make_params(model, rng)
+
+    def reset():
+        shutil.copy(clone / 'big.nml', modeldir / 'big.nml')
+
+    benchmark.pedantic(model.write_params, args=(params,), setup=reset,
+                       rounds=20, warmup_rounds=1)
+    throughput(parameters=len(params))
@@ -0,0 +1,16 @@
+import pytest
+
+from ModelOptimisation2.neighbours import NeighbourIndex
+
+
+@pytest.mark.benchmark(group='neighbours')
+@pytest.mark.parametrize('num_points', [1000, 50000])
+@pytest.mark.parametrize('num_params', [4, 20])
+def test_nearest(benchmark, throughput, rng, num_points, num_params):
+    index = NeighbourIndex([0.] * num_params, [1.] * num_params, 1e-6)
+    for x in rng.random((num_points, num_params)):
+        index.add(x, None)
+    x = rng.random(num_params)
+
+    benchmark(index.nearest, x)
+    throughput(parameters=num_params)
@@ -0,0 +1,35 @@
+import pytest
+import asyncio
+import ObjectiveFunction_client
+
+from ModelOptimisation2.async_client import AsyncObjectiveFunction
+
+from conftest import Server, PARAMETERS
+
+NUM_RUNS = 200
+LATENCY = 0.002
+
+
+@pytest.mark.benchmark(group='server')
+@pytest.mark.parametrize('connections', [1, 8, 32])
+def test_claim_and_transition(benchmark, throughput, rng, connections):
+    objfun = Server(PARAMETERS, latency=LATENCY)
+
+    def setup():
+        objfun.add_runs(NUM_RUNS, ObjectiveFunction_client.LookupState.NEW,
+                        rng)
+
+    async def transitions(client):
+        runs = await client.claim(
+            ObjectiveFunction_client.LookupState.NEW,
+            ObjectiveFunction_client.LookupState.CONFIGURING)
+        assert len(runs) == NUM_RUNS
+        await client.set_states(
+            [runid for runid, params in runs],
+            ObjectiveFunction_client.LookupState.CONFIGURED)
+
+    with AsyncObjectiveFunction(lambda: objfun,
+                                max_connections=connections) as c:
+        benchmark.pedantic(lambda: asyncio.run(transitions(c)),
+                           setup=setup, rounds=3)
+    throughput(runs=NUM_RUNS)
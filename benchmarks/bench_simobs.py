@@ -0,0 +1,21 @@
+import pytest
+
+from ModelOptimisation2.simobs import SimObsExtractor
+
+from conftest import make_netcdf
+
+COORDS = {f'sim{i}': [(i % 10) / 10 + 0.05, (i // 10) / 10 + 0.05]
+          for i in range(100)}
+
+
+@pytest.mark.benchmark(group='extract')
+@pytest.mark.parametrize('num_obs', [5, 100])
+@pytest.mark.parametrize('size', [100, 1000])
+def test_extract(benchmark, throughput, tmp_path, size, num_obs):
+    data_file = tmp_path / 'results.nc'
+    make_netcdf(data_file, size, size, nt=10)
+    extractor = SimObsExtractor(COORDS)
+    names = list(COORDS)[:num_obs]
+
+    benchmark(extractor.extract, data_file, names)
+    throughput(parameters=num_obs)
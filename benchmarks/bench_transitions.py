@@ -0,0 +1,62 @@
+import pytest
+import shutil
+import ObjectiveFunction_client
+
+from ModelOptimisation2.model_config import claim_new_runs, configure_batch
+from ModelOptimisation2.simobs_dummy import claim_runs, postprocess_all
+
+from conftest import make_netcdf
+
+NUM_RUNS = 50
+
+
+@pytest.mark.benchmark(group='modelDir')
+def test_modelDir(benchmark, throughput, config):
+    for runid in range(NUM_RUNS):
+        config.modelDir(runid, create=True)
+
+    def lookup():
+        for runid in range(NUM_RUNS):
+            config.modelDir(runid)
+
+    benchmark(lookup)
+    throughput(runs=NUM_RUNS)
+
+
+@pytest.mark.benchmark(group='transitions')
+@pytest.mark.parametrize('clone_mode', ['copy', 'hardlink'])
+def test_configure(benchmark, throughput, rng, config, objfun, clone_mode):
+    def setup():
+        for modeldir in config.basedir.glob('run_*'):
+            shutil.rmtree(modeldir)
+        objfun.add_runs(NUM_RUNS, ObjectiveFunction_client.LookupState.NEW,
+                        rng)
+
+    def run():
+        runs = claim_new_runs(config, NUM_RUNS)
+        modeldirs, failed = configure_batch(config, config.cloneDir,
+                                            clone_mode, runs)
+        assert len(modeldirs) == NUM_RUNS
+
+    benchmark.pedantic(run, setup=setup, rounds=5, warmup_rounds=1)
+    throughput(runs=NUM_RUNS, parameters=len(objfun.parameters))
+
+
+@pytest.mark.benchmark(group='transitions')
+def test_postprocess(benchmark, throughput, rng, config, objfun):
+    make_netcdf(config.basedir / 'results.nc', 200, 200)
+
+    def setup():
+        runs = objfun.add_runs(NUM_RUNS,
+                               ObjectiveFunction_client.LookupState.RUN, rng)
+        for runid, params in runs:
+            modeldir = config.modelDir(runid, create=True)
+            (modeldir / 'results.nc').symlink_to(
+                config.basedir / 'results.nc')
+
+    def run():
+        failed = postprocess_all(config, claim_runs(config), workers=4)
+        assert len(failed) == 0
+
+    benchmark.pedantic(run, setup=setup, rounds=5)
+    throughput(runs=NUM_RUNS)
@@ -0,0 +1,202 @@
+import pytest
+from pathlib import Path
+import sys
+import numpy
+import xarray
+
+from ModelOptimisation2.config import ModelOptimisationConfig
+from ModelOptimisation2.model import SimpleNamelistValue
+from ModelOptimisation2.model import RepeatedNamelistValue
+from ModelOptimisation2.model import InterpolatedValue, NamelistModel
+
+# the stand-in for the ObjectiveFunction server is shared with the tests
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tests'))
+from fake_server import Server  # noqa: E402
+
+PARAMETERS = {'ab': (-1., 1.),
+              'c': (-1., 1.),
+              'de': (-10., 10.),
+              'f': (-100., 100.)}
+
+TARGETS = {'sim0': 15860.0,
+           'sim1': 1060.0,
+           'sim2': 11713.0,
+           'sim3': 42260.0,
+           'sim4': 25353.0}
+
+CONFIG = """
+[setup]
+app = benchmark
+study = benchmark study
+scenario = benchmark scenario
+basedir = {basedir}
+model = DummyModel
+clone = {clone}
+[parameters]
+[[float_parameters]]
+{parameters}
+[targets]
+{targets}
+"""
+
+THROUGHPUT = []
+
+
+def make_namelist(nmlname, num_groups, num_keys):
+    """write a namelist with the DummyModel group and padding groups
+
+    :param nmlname: the name of the namelist file
+    :param num_groups: the number of padding groups
+    :param num_keys: the number of keys per padding group
+    """
+    lines = ['&polynomial',
+             '    a = 0.0', '    b = 0.0', '    c = 0.0',
+             '    d = 0.0', '    e = 0.0', '    f = 1.0',
+             '/']
+    for g in range(num_groups):
+        lines.append(f'&group{g:04d}')
+        for k in range(num_keys):
+            lines.append(f'    key{k:03d} = {g + k / num_keys}')
+        lines.append(f'    flags = {", ".join([".true."] * 8)}')
+        lines.append("    label = 'padding'")
+        lines.append('/')
+    Path(nmlname).write_text('\n'.join(lines) + '\n')
+
+
+def make_model(nmlfile, num_groups, num_keys):
+    """create a model class mapping every key of the padding groups
+
+    :param nmlfile: the name of the namelist file relative to the model
+    :param num_groups: the number of padding groups
+    :param num_keys: the number of keys per padding group
+    """
+    namelist_map = {}
+    for g in range(num_groups):
+        group = f'group{g:04d}'
+        for k in range(0, num_keys - 4, 3):
+            namelist_map[f'p{g}_{k}'] = SimpleNamelistValue(
+                nmlfile, group, f'key{k:03d}')
+            namelist_map[f'r{g}_{k}'] = RepeatedNamelistValue(
+                nmlfile, group, [f'key{k + 1:03d}', f'key{k + 2:03d}'])
+        namelist_map[f'i{g}'] = InterpolatedValue(
+            nmlfile, group, f'key{num_keys - 2:03d}',
+            f'key{num_keys - 1:03d}',
+            [-1, 0, 1], [10, 0, -5])
+    return type('BenchmarkModel', (NamelistModel,),
+                {'NAMELIST_MAP': namelist_map})
+
+
+def make_params(model, rng):
+    """draw a random value for every parameter of a model
+
+    :param model: the model class
+    :param rng: the random number generator
+    """
+    return {key: float(v) for key, v in zip(
+        model.NAMELIST_MAP,
+        rng.uniform(-1., 1., len(model.NAMELIST_MAP)))}
+
+
+def make_rose_conf(confname, num_sections, num_keys):
+    """write a rose-app.conf with namelist sections
+
+    :param confname: the name of the configuration file
+    :param num_sections: the number of namelist sections
+    :param num_keys: the number of keys per section
+    """
+    lines = ['[command]', 'default=um-atmos', '']
+    for s in range(num_sections):
+        lines.append(f'[namelist:section{s:04d}]')
+        for k in range(num_keys):
+            if k % 5 == 4:
+                lines.append(f'!!key{k:03d}={s + k}')
+            else:
+                lines.append(f'key{k:03d}={s + k / num_keys}')
+        lines.append('')
+    Path(confname).write_text('\n'.join(lines))
+
+
+def make_netcdf(ncname, nx, ny, nt=1):
+    """write model output on a regular grid
+
+    :param ncname: the name of the netCDF file
+    :param nx: the number of points in x direction
+    :param ny: the number of points in y direction
+    :param nt: the number of time slices
+    """
+    x = numpy.linspace(-2., 3., nx)
+    y = numpy.geomspace(1., 50., ny)
+    z = numpy.add.outer(y ** 2, 10 * x)
+    other = numpy.broadcast_to(z, (nt, ny, nx))
+    xarray.Dataset({'z': (('y', 'x'), z),
+                    'other': (('t', 'y', 'x'), other)},
+                   coords={'x': x, 'y': y}).to_netcdf(ncname)
+
+
+@pytest.fixture
+def rng():
+    return numpy.random.default_rng(42)
+
+
+@pytest.fixture
+def objfun():
+    return Server(PARAMETERS)
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch, objfun):
+    """a model optimisation configuration using the stand-in server"""
+    basedir = tmp_path / 'basedir'
+    basedir.mkdir()
+    clone = tmp_path / 'clone'
+    clone.mkdir()
+    make_namelist(clone / 'config.nml', 100, 20)
+
+    parameters = '\n'.join(
+        f'[[[{p}]]]\nvalue = {sum(b) / 2}\nmin = {b[0]}\nmax = {b[1]}'
+        for p, b in PARAMETERS.items())
+    targets = '\n'.join(f'{t} = {v}' for t, v in TARGETS.items())
+    cfgname = tmp_path / 'modelopt.cfg'
+    cfgname.write_text(CONFIG.format(basedir=basedir, clone=clone,
+                                     parameters=parameters, targets=targets))
+
+    monkeypatch.setattr(ModelOptimisationConfig, 'newObjectiveFunction',
+                        lambda self: objfun)
+    return ModelOptimisationConfig(cfgname)
+
+
+@pytest.fixture
+def throughput(benchmark):
+    """record the throughput of a benchmark per run and per parameter
+
+    Call the returned function after running the benchmark. The
+    throughput is stored with the benchmark results and summarised at
+    the end of the session.
+    """
+    def record(runs=1, parameters=None):
+        benchmark.extra_info['runs'] = runs
+        if parameters is not None:
+            benchmark.extra_info['parameters'] = parameters
+        if benchmark.stats is None:
+            # benchmarks are disabled
+            return
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info['runs_per_second'] = runs / mean
+        if parameters is not None:
+            benchmark.extra_info['parameters_per_second'] = \
+                runs * parameters / mean
+        THROUGHPUT.append((benchmark.name, dict(benchmark.extra_info)))
+    return record
+
+
+def pytest_terminal_summary(terminalreporter):
+    if len(THROUGHPUT) == 0:
+        return
+    terminalreporter.section('throughput')
+    terminalreporter.write_line(
+        f'{"Name":<60} {"runs/s":>14} {"parameters/s":>14}')
+    for name, info in THROUGHPUT:
+        params = info.get('parameters_per_second')
+        params = f'{params:14.1f}' if params is not None else f'{"-":>14}'
+        terminalreporter.write_line(
+            f'{name:<60} {info["runs_per_second"]:14.1f} {params}')
@@ -35,6 +35,10 @@ setup(
         'testing': [
             'pytest',
         ],
+        'benchmark': [
+            'pytest',
+            'pytest-benchmark',
+        ],
     },
     entry_points={
         'console_scripts': [
@@ -43,6 +47,15 @@ setup(
             'mo2-transition = ModelOptimisation2.transition:main',
             'mo2-simobs_dummy = ModelOptimisation2.simobs_dummy:main',
             'mo2-optimise = ModelOptimisation2.optimise:main',
+            'mo2-profile = ModelOptimisation2.instrument:main',
+            'mo2-ensemble = ModelOptimisation2.ensemble:main',
+            'mo2-monitor = ModelOptimisation2.monitor:main',
+        ],
+        'ModelOptimisation2.models': [
+            'DummyModel = ModelOptimisation2.config_dummy:DummyModel',
+            'UKESM = ModelOptimisation2.config_UKESM:UKESM',
+            'MITgcm = ModelOptimisation2.config_MITgcm:MITgcm',
+            'HadCM3 = ModelOptimisation2.config_HadCM3:HadCM3',
         ],
     },
     author=author,
@@ -0,0 +1,118 @@
+import pytest
+from pathlib import Path
+import f90nml
+import numpy
+import xarray
+import ObjectiveFunction_client
+
+from ModelOptimisation2.config import ModelOptimisationConfig
+
+from fake_server import Server
+
+LookupState = ObjectiveFunction_client.LookupState
+
+PARAMETERS = {'ab': (-1., 1.),
+              'c': (-1., 1.),
+              'de': (-10., 10.),
+              'f': (-100., 100.)}
+
+TARGETS = {'sim0': 12.,
+           'sim1': 150.,
+           'sim2': 650.,
+           'sim3': 80.,
+           'sim4': 700.}
+
+CONFIG = """
+[setup]
+app = test
+study = test study
+scenario = test scenario
+basedir = {basedir}
+model = DummyModel
+clone = {clone}
+[parameters]
+[[float_parameters]]
+{parameters}
+[targets]
+{targets}
+"""
+
+NAMELIST = """&POLYNOMIAL
+A=1.
+B=1.
+C=0.5
+D=1.
+E=2.
+F=10.
+/
+&MESH
+X0=0.
+Y0=-20.
+DX=2.
+DY=1.
+NX=20
+NY=40
+/
+"""
+
+
+def run_dummy(modeldir):
+    """run the dummy model, a polynomial evaluated on a mesh
+
+    The result is also written as the restart file of the run.
+
+    :param modeldir: the model directory containing config.nml
+    """
+    nml = f90nml.read(Path(modeldir) / 'config.nml')
+    p = nml['polynomial']
+    mesh = nml['mesh']
+    x = mesh['x0'] + mesh['dx'] * numpy.arange(mesh['nx'])
+    y = mesh['y0'] + mesh['dy'] * numpy.arange(mesh['ny'])
+    xx, yy = numpy.meshgrid(x, y)
+    z = p['a'] * xx ** 2 + p['b'] * yy ** 2 + p['c'] * xx * yy + \
+        p['d'] * xx + p['e'] * yy + p['f']
+    result = xarray.Dataset({'z': (('y', 'x'), z)}, coords={'x': x, 'y': y})
+    result.to_netcdf(Path(modeldir) / 'results.nc')
+    result.to_netcdf(Path(modeldir) / 'restart.nc')
+
+
+@pytest.fixture
+def server():
+    return Server(PARAMETERS)
+
+
+@pytest.fixture
+def clonedir(tmp_path):
+    clone = tmp_path / 'clone'
+    clone.mkdir()
+    (clone / 'config.nml').write_text(NAMELIST)
+    return clone
+
+
+@pytest.fixture
+def config_file(tmp_path, clonedir):
+    basedir = tmp_path / 'basedir'
+    basedir.mkdir()
+    parameters = '\n'.join(
+        f'[[[{p}]]]\nvalue = {sum(b) / 2}\nmin = {b[0]}\nmax = {b[1]}'
+        for p, b in PARAMETERS.items())
+    targets = '\n'.join(f'{t} = {v}' for t, v in TARGETS.items())
+    cfgname = tmp_path / 'modelopt.cfg'
+    cfgname.write_text(CONFIG.format(basedir=basedir, clone=clonedir,
+                                     parameters=parameters, targets=targets))
+    return cfgname
+
+
+@pytest.fixture
+def config(config_file, monkeypatch, server):
+    """a model optimisation configuration using the dummy model and
+    the in-process server"""
+    monkeypatch.setattr(ModelOptimisationConfig, 'newObjectiveFunction',
+                        lambda self: server)
+    return ModelOptimisationConfig(config_file)
+
+
+@pytest.fixture
+def dummy_model():
+    """callable running the dummy model in a model directory"""
+    return run_dummy
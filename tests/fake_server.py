@@ -0,0 +1,129 @@
+import threading
+import time
+import numpy
+import ObjectiveFunction_client
+
+LookupState = ObjectiveFunction_client.LookupState
+
+
+class Server:
+    """an in-process stand-in for the ObjectiveFunction server
+
+    A parameter set first seen by the objective function is
+    provisional, it becomes a new run when it is requested again.
+    Requests are atomic. The states set by setState and set_result are
+    recorded in the history of each run. The server is shared by the
+    tests and the benchmarks.
+
+    :param parameters: dictionary mapping parameter names to bounds
+    :param latency: the time in seconds each request takes
+    """
+
+    def __init__(self, parameters, latency=0.):
+        self.parameters = parameters
+        self.latency = latency
+        self.lower_bounds = numpy.array([b[0] for b in parameters.values()])
+        self.upper_bounds = numpy.array([b[1] for b in parameters.values()])
+        self.runs = {}
+        self.states = {}
+        self.results = {}
+        self.history = {}
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def _key(self, params):
+        return tuple(round(float(params[p]), 10) for p in self.parameters)
+
+    def params2values(self, params, include_constant=True):
+        return numpy.array([params[p] for p in self.parameters])
+
+    def values2params(self, values):
+        return {p: float(v) for p, v in zip(self.parameters, values)}
+
+    def add_run(self, params, state=LookupState.NEW):
+        """create a run
+
+        :param params: dictionary of parameter values
+        :param state: the state of the new run
+        :return: the ID of the run
+        """
+        with self._lock:
+            runid = len(self.runs)
+            self.runs[runid] = dict(params)
+            self.states[runid] = state
+            self._ids[self._key(params)] = runid
+        return runid
+
+    def add_runs(self, num_runs, state, rng):
+        """create runs with random parameters
+
+        :param num_runs: the number of runs to create
+        :param state: the state of the new runs
+        :param rng: the random number generator
+        :return: a list of run ID, parameter tuples
+        """
+        runs = []
+        for i in range(num_runs):
+            params = {p: float(rng.uniform(*b))
+                      for p, b in self.parameters.items()}
+            runs.append((self.add_run(params, state=state), params))
+        return runs
+
+    def _request(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def __call__(self, x):
+        self._request()
+        params = self.values2params(x)
+        key = self._key(params)
+        with self._lock:
+            runid = self._ids.get(key)
+            if runid is None:
+                runid = len(self.runs)
+                self.runs[runid] = params
+                self.states[runid] = LookupState.PROVISIONAL
+                self._ids[key] = runid
+                raise ObjectiveFunction_client.PreliminaryRun
+            if self.states[runid] == LookupState.PROVISIONAL:
+                self.states[runid] = LookupState.NEW
+                raise ObjectiveFunction_client.NewRun
+            if self.states[runid] != LookupState.COMPLETED:
+                raise ObjectiveFunction_client.Waiting
+            return self.results[runid]
+
+    def get_with_state(self, state, with_id=False, new_state=None):
+        self._request()
+        with self._lock:
+            for runid in sorted(self.states):
+                if self.states[runid] == state:
+                    if new_state is not None:
+                        self.states[runid] = new_state
+                    params = dict(self.runs[runid])
+                    return (runid, params) if with_id else params
+        raise LookupError(f'no runs in state {state.name}')
+
+    def getState(self, runid):
+        self._request()
+        with self._lock:
+            if runid not in self.states:
+                raise LookupError(f'no run with ID {runid}')
+            return self.states[runid]
+
+    def setState(self, runid, state):
+        self._request()
+        with self._lock:
+            if runid not in self.states:
+                raise LookupError(f'no run with ID {runid}')
+            self.states[runid] = state
+            self.history.setdefault(runid, []).append(state)
+
+    def set_result(self, params, simobs):
+        self._request()
+        with self._lock:
+            runid = self._ids[self._key(params)]
+            if self.states[runid] != LookupState.POSTPROCESSING:
+                raise RuntimeError(f'run {runid} is in wrong state')
+            self.results[runid] = numpy.asarray(simobs, dtype=float)
+            self.states[runid] = LookupState.COMPLETED
+            self.history.setdefault(runid, []).append(self.states[runid])
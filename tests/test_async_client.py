@@ -0,0 +1,159 @@
+import pytest
+import asyncio
+import threading
+import time
+
+from ModelOptimisation2.async_client import AsyncObjectiveFunction
+
+LATENCY = 0.05
+
+
+class Server:
+    """a stand-in for the ObjectiveFunction server with latency"""
+
+    lower_bounds = [0., 0.]
+
+    def __init__(self, num_runs):
+        self.states = {runid: 'NEW' for runid in range(num_runs)}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.active, self.max_active)
+        time.sleep(LATENCY)
+        with self._lock:
+            self.active -= 1
+
+    def get_with_state(self, state, with_id=False, new_state=None):
+        self._request()
+        with self._lock:
+            for runid in self.states:
+                if self.states[runid] == state:
+                    self.states[runid] = new_state
+                    return runid, {'a': float(runid)}
+        raise LookupError(f'no runs in state {state}')
+
+    def getState(self, runid):
+        self._request()
+        if runid < 0:
+            raise RuntimeError('server error')
+        if runid not in self.states:
+            raise LookupError(f'no run with ID {runid}')
+        return self.states[runid]
+
+    def setState(self, runid, state):
+        self._request()
+        if runid < 0:
+            raise RuntimeError('server error')
+        with self._lock:
+            self.states[runid] = state
+
+
+@pytest.mark.parametrize('num_runs', [None, 5, 30])
+def test_claim(num_runs):
+    server = Server(20)
+    with AsyncObjectiveFunction(lambda: server, max_connections=8) as objfun:
+        start = time.perf_counter()
+        runs = asyncio.run(objfun.claim('NEW', 'CONFIGURING',
+                                        num_runs=num_runs))
+        elapsed = time.perf_counter() - start
+
+    expected = 20 if num_runs is None else min(num_runs, 20)
+    assert sorted(runid for runid, params in runs) == list(range(expected))
+    for runid, params in runs:
+        assert params == {'a': float(runid)}
+    assert list(server.states.values()).count('CONFIGURING') == expected
+    assert server.max_active <= 8
+    # requests are made in waves of at most 8 concurrent requests
+    assert elapsed < LATENCY * 5
+
+
+class FailingServer(Server):
+    """a server that fails after a number of runs have been claimed"""
+
+    def __init__(self, num_runs, num_claims):
+        super().__init__(num_runs)
+        self.num_claims = num_claims
+
+    def get_with_state(self, state, with_id=False, new_state=None):
+        with self._lock:
+            self.num_claims -= 1
+            if self.num_claims < 0:
+                raise RuntimeError('server error')
+        return super().get_with_state(state, with_id=with_id,
+                                      new_state=new_state)
+
+
+def test_claim_failure():
+    server = FailingServer(20, 10)
+    with AsyncObjectiveFunction(lambda: server, max_connections=4) as objfun:
+        with pytest.raises(RuntimeError):
+            asyncio.run(objfun.claim('NEW', 'CONFIGURING'))
+    # the claimed runs are released
+    assert set(server.states.values()) == {'NEW'}
+
+
+def test_client_per_thread():
+    server = Server(20)
+    clients = []
+
+    class Client:
+        def __init__(self):
+            self.threads = set()
+            clients.append(self)
+
+        def getState(self, runid):
+            self.threads.add(threading.get_ident())
+            return server.getState(runid)
+
+    with AsyncObjectiveFunction(Client, max_connections=4) as objfun:
+        asyncio.run(objfun.get_states(list(range(20))))
+    # one client per worker thread
+    used = [client for client in clients if len(client.threads) > 0]
+    assert 1 < len(used) <= 4
+    for client in used:
+        assert len(client.threads) == 1
+
+
+def test_set_states():
+    server = Server(20)
+    with AsyncObjectiveFunction(lambda: server, max_connections=20) as objfun:
+        assert objfun.lower_bounds == [0., 0.]
+        start = time.perf_counter()
+        asyncio.run(objfun.set_states(list(range(20)), 'RUN'))
+        assert time.perf_counter() - start < LATENCY * 5
+        assert server.max_active > 1
+        assert set(server.states.values()) == {'RUN'}
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(objfun.set_states([1, -1], 'RUN'))
+
+
+def test_get_states():
+    server = Server(3)
+    server.states[1] = 'RUN'
+    with AsyncObjectiveFunction(lambda: server) as objfun:
+        assert asyncio.run(objfun.get_states([0, 1, 5])) == {
+            0: 'NEW', 1: 'RUN', 5: None}
+        with pytest.raises(RuntimeError):
+            asyncio.run(objfun.get_states([0, -1]))
+
+
+def test_max_connections():
+    with pytest.raises(ValueError):
+        AsyncObjectiveFunction(lambda: Server(1), max_connections=0)
+
+
+def test_map():
+    server = Server(3)
+
+    def double(client, runid, factor):
+        return client.getState(runid) * factor
+
+    with AsyncObjectiveFunction(lambda: server) as objfun:
+        results = asyncio.run(objfun.map(double, [0, 2, 5], [1, 2, 3]))
+    assert results[:2] == ['NEW', 'NEWNEW']
+    assert isinstance(results[2], LookupError)
@@ -0,0 +1,69 @@
+import pytest
+from pathlib import Path
+import numpy
+
+from ModelOptimisation2.cache import ResultCache
+from ModelOptimisation2.neighbours import NeighbourIndex
+
+
+@pytest.fixture
+def fname(tmpdir):
+    return Path(tmpdir, 'results.sqlite')
+
+
+def test_cache(fname):
+    cache = ResultCache(fname)
+    assert len(cache) == 0
+    assert cache.get([0.1, 2.]) is None
+
+    cache.set([0.1, 2.], [1., 2., 3.])
+    assert [0.1, 2.] in cache
+    assert numpy.array_equal(cache.get([0.1, 2.]), [1., 2., 3.])
+    # keys are rounded
+    assert numpy.array_equal(cache.get([0.1 + 1e-15, 2.]), [1., 2., 3.])
+    assert cache.get([0.1 + 1e-6, 2.]) is None
+
+    # results are loaded from the database
+    cache = ResultCache(fname)
+    assert len(cache) == 1
+    assert numpy.array_equal(cache.get([0.1, 2.]), [1., 2., 3.])
+    x, obs = list(cache.items())[0]
+    assert numpy.array_equal(x, [0.1, 2.])
+
+
+def test_cache_neighbours(fname):
+    cache = ResultCache(fname)
+    cache.set([0.1, 2.], [1., 2., 3.])
+
+    cache = ResultCache(fname, index=NeighbourIndex([0., 0.], [1., 10.],
+                                                    1e-4))
+    assert [0.1 + 1e-6, 2.] in cache
+    assert numpy.array_equal(cache.get([0.1 + 1e-6, 2.]), [1., 2., 3.])
+    assert cache.get([0.1 + 1e-3, 2.]) is None
+    cache.set([0.5, 5.], [4., 5., 6.])
+    assert numpy.array_equal(cache.get([0.5, 5. - 1e-4]), [4., 5., 6.])
+
+
+def test_cache_refresh(fname):
+    cache = ResultCache(fname)
+    other = ResultCache(fname)
+    other.set([0.1, 2.], [1., 2., 3.])
+    assert len(cache) == 0
+    cache.refresh()
+    assert numpy.array_equal(cache.get([0.1, 2.]), [1., 2., 3.])
+    cache.refresh()
+    assert len(cache) == 1
+
+
+def test_cache_pruned(fname):
+    cache = ResultCache(fname)
+    # runs are pruned by another process
+    ResultCache(fname).prune([0.1, 2.], [7., 8., 9.])
+    assert cache.pruned([0.1, 2.])
+    assert not cache.pruned([0.5, 2.])
+    assert numpy.array_equal(cache.penalty([0.1, 2.]), [7., 8., 9.])
+    assert cache.penalty([0.5, 2.]) is None
+    cache.set([0.1, 2.], [1., 2., 3.])
+    cache.set([0.5, 2.], [4., 5., 6.])
+    assert cache.get([0.1, 2.]) is None
+    assert len(ResultCache(fname)) == 1
@@ -0,0 +1,74 @@
+import pytest
+from pathlib import Path
+import numpy
+
+from ModelOptimisation2.checkpoint import Checkpoint
+
+
+@pytest.fixture
+def fname(tmpdir):
+    return Path(tmpdir, 'optimise.checkpoint')
+
+
+def test_checkpoint(fname):
+    checkpoint = Checkpoint(fname)
+    assert len(checkpoint) == 0
+    assert checkpoint.lookup([0., 1.]) is None
+
+    checkpoint.record([0., 1.], [1., 2., 3.])
+    checkpoint.record([0.1, 1.], [4., 5., 6.])
+
+    # replay from the file
+    checkpoint = Checkpoint(fname)
+    assert len(checkpoint) == 2
+    assert numpy.array_equal(checkpoint.lookup([0., 1.]), [1., 2., 3.])
+    assert numpy.array_equal(checkpoint.lookup([0.1, 1.]), [4., 5., 6.])
+    assert checkpoint.lookup([0.2, 1.]) is None
+
+    # diverge from the log
+    checkpoint.rewind()
+    assert checkpoint.lookup([0., 1.]) is not None
+    assert checkpoint.lookup([0., 0.9]) is None
+    checkpoint.record([0., 0.9], [7., 8., 9.])
+
+    checkpoint = Checkpoint(fname)
+    assert len(checkpoint) == 2
+    assert checkpoint.lookup([0., 1.]) is not None
+    assert numpy.array_equal(checkpoint.lookup([0., 0.9]), [7., 8., 9.])
+
+
+def test_checkpoint_verify(fname):
+    checkpoint = Checkpoint(fname)
+    checkpoint.record([0., 1.], [1., 2.])
+    checkpoint.record([0.1, 1.], [3., 4.])
+
+    stored = {0.: numpy.array([1., 2.]), 0.1: numpy.array([3., 4.])}
+    assert checkpoint.verify(lambda x: stored[x[0]])
+    assert checkpoint.verify(lambda x: None)
+    assert len(checkpoint) == 2
+
+    # every logged evaluation is checked
+    stored[0.] = numpy.array([1., 2.5])
+    assert not checkpoint.verify(lambda x: stored[x[0]])
+    assert len(checkpoint) == 0
+    checkpoint.record([0., 1.], [1., 2.])
+
+    def lookup(x):
+        raise LookupError
+
+    assert not checkpoint.verify(lookup)
+    assert len(checkpoint) == 0
+    assert len(Checkpoint(fname)) == 0
+
+
+def test_checkpoint_verify_errors(fname):
+    checkpoint = Checkpoint(fname)
+    checkpoint.record([0., 1.], [1., 2.])
+
+    def lookup(x):
+        raise ConnectionError
+
+    # only missing evaluations discard the checkpoint
+    with pytest.raises(ConnectionError):
+        checkpoint.verify(lookup)
+    assert len(Checkpoint(fname)) == 1
@@ -0,0 +1,44 @@
+import pytest
+from pathlib import Path
+
+from ModelOptimisation2.clone import CLONE_MODES, clone_model
+
+
+@pytest.fixture
+def clonedir(tmpdir_factory):
+    res = Path(tmpdir_factory.mktemp("clone"))
+    (res / 'app' / 'um').mkdir(parents=True)
+    (res / 'app' / 'um' / 'rose-app.conf').write_text('config')
+    (res / 'ancil.dat').write_text('ancillary')
+    return res
+
+
+@pytest.mark.parametrize('mode', CLONE_MODES)
+def test_clone_model(clonedir, tmpdir, mode):
+    modeldir = Path(tmpdir, 'model')
+    modeldir.mkdir()
+    (modeldir / 'objfun.runid').write_text('1')
+
+    clone_model(clonedir, modeldir, mode=mode,
+                materialise=['app/um/rose-app.conf'])
+
+    assert (modeldir / 'objfun.runid').read_text() == '1'
+    for name in ['app/um/rose-app.conf', 'ancil.dat']:
+        assert (modeldir / name).read_text() == (clonedir / name).read_text()
+
+    # modified files are always copied
+    cfg = modeldir / 'app' / 'um' / 'rose-app.conf'
+    assert not cfg.is_symlink()
+    assert not cfg.samefile(clonedir / 'app' / 'um' / 'rose-app.conf')
+
+    ancil = modeldir / 'ancil.dat'
+    assert ancil.is_symlink() == (mode == 'symlink')
+    if mode in ['copy', 'reflink']:
+        assert not ancil.samefile(clonedir / 'ancil.dat')
+    else:
+        assert ancil.samefile(clonedir / 'ancil.dat')
+
+
+def test_clone_model_fail(clonedir, tmpdir):
+    with pytest.raises(ValueError):
+        clone_model(clonedir, Path(tmpdir, 'model'), mode='fail')
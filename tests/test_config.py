@@ -0,0 +1,91 @@
+import pytest
+import importlib.metadata
+import threading
+import ObjectiveFunction_client
+
+from ModelOptimisation2.config import ModelRegistry, MODELS
+from ModelOptimisation2.config import ModelOptimisationConfig
+from ModelOptimisation2.config_MITgcm import MITgcm
+from ModelOptimisation2.config_dummy import DummyModel
+
+
+def test_models():
+    assert MODELS['DummyModel'] is DummyModel
+    assert 'HadCM3' in MODELS
+
+
+def test_model_registry(monkeypatch):
+    group = 'test.models'
+    ep = importlib.metadata.EntryPoint(
+        name='PluginModel', group=group,
+        value='ModelOptimisation2.config_MITgcm:MITgcm')
+
+    def entry_points():
+        return {group: [ep]}
+
+    monkeypatch.setattr(importlib.metadata, 'entry_points', entry_points)
+
+    registry = ModelRegistry({'DummyModel': '.config_dummy:DummyModel'},
+                             group=group)
+    assert registry['DummyModel'] is DummyModel
+    assert registry['PluginModel'] is MITgcm
+    assert sorted(registry) == ['DummyModel', 'PluginModel']
+    assert 'Missing' not in registry
+
+
+CONFIG = """
+[setup]
+app = test
+study = test study
+scenario = test scenario
+basedir = $MO2_TEST_BASEDIR/basedir
+[parameters]
+[[float_parameters]]
+[[[a]]]
+value = 0.
+min = -1.
+max = 1.
+[targets]
+sim0 = 1.
+sim1 = 2.
+[scales]
+sim1 = 4.
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('MO2_TEST_BASEDIR', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    cfg = tmp_path / 'modelopt.cfg'
+    cfg.write_text(CONFIG)
+    return cfg
+
+
+def test_config_scales(config_file):
+    config = ModelOptimisationConfig(config_file)
+    assert config.scales == {'sim0': 1., 'sim1': 4.}
+
+
+def test_new_objective_function(config_file, monkeypatch):
+    # the base configuration caches its client
+    def objectiveFunction(self):
+        if getattr(self, '_client', None) is None:
+            self._client = object()
+        return self._client
+
+    monkeypatch.setattr(ObjectiveFunction_client.ObjFunConfig,
+                        'objectiveFunction', property(objectiveFunction),
+                        raising=False)
+    config = ModelOptimisationConfig(config_file)
+    clients = [config.newObjectiveFunction() for i in range(2)]
+    assert clients[0] is not clients[1]
+
+    # each thread has its own client
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(config.objectiveFunction))
+    thread.start()
+    thread.join()
+    assert config.objectiveFunction is config.objectiveFunction
+    assert other[0] is not config.objectiveFunction
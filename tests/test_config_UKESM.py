@@ -1,7 +1,10 @@
 import pytest
+import io
 from pathlib import Path
 
 from ModelOptimisation2.config_UKESM import UKESM
+from ModelOptimisation2.config_UKESM import _process_config
+from ModelOptimisation2.config_UKESM import _process_config_stream
 
 CONFIG = """
 [file:ATMOSCNTL]
@@ -78,3 +81,36 @@ def test_UKESM(rundir):
         CONFIG.format(
             iau_nontrop_max_p=50000.,
             diagcloud_qn_compregimelimit=30.)
+
+
+SECTIONS = """[namelist:run_precip]
+!!ai=1.0
+ai=2.0
+ai_extra=3.0
+
+[namelist:run_radiation]
+ai=4.0
+dp_corr_strat=5.0
+l_flag=.false.
+"""
+
+
+def test_process_config():
+    parameters = {'run_precip': {'ai': 2.5, 'ai_extra': 3},
+                  'run_radiation': {'l_flag': True, 'missing': 1.},
+                  'missing_section': {'ai': 1.}}
+
+    expected = SECTIONS.replace('ai=2.0', 'ai=2.5')\
+        .replace('ai_extra=3.0', 'ai_extra=3')\
+        .replace('l_flag=.false.', 'l_flag=.true.')
+
+    assert _process_config(SECTIONS, parameters) == expected
+
+    outfile = io.StringIO()
+    _process_config_stream(io.StringIO(SECTIONS), outfile, parameters)
+    assert outfile.getvalue() == expected
+
+
+def test_process_config_fail():
+    with pytest.raises(TypeError):
+        _process_config(SECTIONS, {'run_precip': {'ai': 'fail'}})
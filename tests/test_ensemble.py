@@ -0,0 +1,101 @@
+import pytest
+import sys
+import numpy
+import ObjectiveFunction_client
+
+from ModelOptimisation2.ensemble import make_design, register, main, DESIGNS
+
+LookupState = ObjectiveFunction_client.LookupState
+
+LOWER = numpy.array([-1., 0., -10., -100.])
+UPPER = numpy.array([1., 1., 10., 100.])
+
+
+@pytest.mark.parametrize('method', DESIGNS)
+def test_design(method):
+    design = make_design(method, 8, LOWER, UPPER, seed=1)
+    num_members = 8 ** 4 if method == 'grid' else 8
+    assert design.shape == (num_members, 4)
+    assert numpy.all(design >= LOWER)
+    assert numpy.all(design <= UPPER)
+    assert numpy.array_equal(design,
+                             make_design(method, 8, LOWER, UPPER, seed=1))
+
+
+def test_latin_hypercube():
+    num_members = 100
+    design = make_design('lhs', num_members, LOWER, UPPER, seed=2)
+    # every stratum of every parameter contains exactly one member
+    strata = numpy.floor((design - LOWER) / (UPPER - LOWER) * num_members)
+    for p in range(len(LOWER)):
+        assert sorted(strata[:, p]) == list(range(num_members))
+
+
+def test_grid():
+    design = make_design('grid', 3, LOWER[:2], UPPER[:2])
+    assert design.tolist() == [[-1., 0.], [-1., 0.5], [-1., 1.],
+                               [0., 0.], [0., 0.5], [0., 1.],
+                               [1., 0.], [1., 0.5], [1., 1.]]
+
+
+@pytest.mark.parametrize('method,num', [('lhs', 0), ('other', 10),
+                                        ('grid', 1000)])
+def test_design_fail(method, num):
+    with pytest.raises(ValueError):
+        make_design(method, num, LOWER, UPPER)
+
+
+@pytest.fixture
+def points(server):
+    return make_design('lhs', 20, server.lower_bounds, server.upper_bounds,
+                       seed=3)
+
+
+def test_register(config, server, points):
+    new, failed = register(config, points)
+    assert new == [True] * len(points)
+    assert failed == {}
+    assert set(server.states.values()) == {LookupState.NEW}
+
+    # registering the members again does not create runs
+    new, failed = register(config, points[:5])
+    assert new == [False] * 5
+    assert failed == {}
+    assert len(server.runs) == len(points)
+
+
+def test_register_failure(config, server, points, monkeypatch):
+    call = type(server).__call__
+
+    def flaky(self, x):
+        if numpy.array_equal(x, points[3]):
+            raise ObjectiveFunction_client.PreliminaryRun
+        if numpy.array_equal(x, points[4]):
+            raise ConnectionError('server went away')
+        return call(self, x)
+
+    monkeypatch.setattr(type(server), '__call__', flaky)
+    new, failed = register(config, points)
+    assert sorted(failed) == [3, 4]
+    assert isinstance(failed[4], ConnectionError)
+    assert sum(new) == len(points) - 2
+
+
+def test_main(config, config_file, server, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['mo2-ensemble', str(config_file),
+                                      '-n', '6', '--configure', '-w', '2'])
+    main()
+    assert len(capsys.readouterr().out.split()) == 6
+    assert list(server.states.values()) == [LookupState.CONFIGURED] * 6
+
+
+def test_main_failure(config, config_file, server, monkeypatch):
+    def preliminary(self, x):
+        raise ObjectiveFunction_client.PreliminaryRun
+
+    monkeypatch.setattr(type(server), '__call__', preliminary)
+    monkeypatch.setattr(sys, 'argv', ['mo2-ensemble', str(config_file),
+                                      '-n', '3'])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+import pytest
+
+# modules that are slow to import and not needed to start the
+# lightweight commands
+HEAVY = ['numpy', 'scipy', 'pandas', 'xarray', 'dfols']
+
+SCRIPT = """
+import json, sys
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def import_module(module):
+    output = subprocess.run([sys.executable, '-c',
+                             SCRIPT.format(module=module)],
+                            check=True, capture_output=True, text=True)
+    return json.loads(output.stdout)
+
+
+@pytest.mark.parametrize('module', ['ModelOptimisation2.transition',
+                                    'ModelOptimisation2.model_config',
+                                    'ModelOptimisation2.write_config'])
+def test_no_heavy_imports(module):
+    # the import time is measured by benchmarks/bench_imports.py
+    loaded = {m.split('.')[0] for m in import_module(module)}
+    for heavy in HEAVY:
+        assert heavy not in loaded, f'{module} imports {heavy}'
@@ -0,0 +1,116 @@
+import pytest
+import pickle
+import ObjectiveFunction_client
+
+from ModelOptimisation2.instrument import Instrument, TimedObjectiveFunction
+from ModelOptimisation2.instrument import load_records, summarise
+from ModelOptimisation2.instrument import profiling_enabled, PROFILE_ENV
+
+
+class ObjFun:
+    lower_bounds = [0., 0.]
+
+    def __call__(self, x):
+        return [2 * v for v in x]
+
+    def setState(self, runid, state):
+        pass
+
+    def get_with_state(self, state, with_id=False, new_state=None):
+        if with_id:
+            return 7, {'a': 1.}
+        return {'a': 1.}
+
+
+@pytest.fixture
+def instrument(tmp_path):
+    return Instrument(tmp_path / 'profile')
+
+
+def test_profiling_enabled(monkeypatch):
+    monkeypatch.delenv(PROFILE_ENV, raising=False)
+    assert not profiling_enabled()
+    assert profiling_enabled(True)
+    monkeypatch.setenv(PROFILE_ENV, '1')
+    assert profiling_enabled()
+    monkeypatch.setenv(PROFILE_ENV, 'no')
+    assert not profiling_enabled(True)
+
+
+def test_timer(instrument):
+    with instrument.timer('clone', runid=3):
+        pass
+    with pytest.raises(RuntimeError):
+        with instrument.timer('write_params', runid=3):
+            raise RuntimeError
+    with instrument.timer('solve'):
+        pass
+
+    assert instrument.records_name(3).exists()
+    records = list(load_records(instrument.directory, runids=[3]))
+    assert [r['phase'] for r in records] == ['clone', 'write_params']
+    assert 'error' not in records[0]
+    assert records[1]['error'] == 'RuntimeError'
+    for r in records:
+        assert r['runid'] == 3
+        assert r['duration'] >= 0
+    records = list(load_records(instrument.directory))
+    assert [r['phase'] for r in records] == ['solve', 'clone', 'write_params']
+
+
+@pytest.mark.parametrize('exception', ['PreliminaryRun', 'NewRun',
+                                       'Waiting'])
+def test_timer_outcome(instrument, exception):
+    with pytest.raises(getattr(ObjectiveFunction_client, exception)):
+        with instrument.timer('evaluate'):
+            raise getattr(ObjectiveFunction_client, exception)
+    records = list(load_records(instrument.directory))
+    assert records[0]['outcome'] == exception
+    assert 'error' not in records[0]
+
+
+def test_timer_disabled(tmp_path):
+    instrument = Instrument(tmp_path / 'profile', enabled=False)
+    with instrument.timer('clone', runid=3):
+        pass
+    assert instrument.wrap(sorted, 'sort') is sorted
+    assert not instrument.directory.exists()
+
+
+def test_wrap(instrument):
+    timed = pickle.loads(pickle.dumps(instrument.wrap(sorted, 'sort', 1)))
+    assert timed([3, 1, 2]) == [1, 2, 3]
+    records = list(load_records(instrument.directory))
+    assert len(records) == 1
+    assert records[0]['phase'] == 'sort'
+    assert records[0]['runid'] == 1
+
+
+def test_TimedObjectiveFunction(instrument):
+    objfun = TimedObjectiveFunction(ObjFun(), instrument)
+    assert objfun.lower_bounds == [0., 0.]
+    assert objfun([1., 2.]) == [2., 4.]
+    objfun.setState(3, 'RUN')
+    assert objfun.get_with_state('NEW', with_id=True) == (7, {'a': 1.})
+    objfun.get_with_state('NEW')
+
+    records = list(load_records(instrument.directory))
+    assert [(r['phase'], r['runid']) for r in records] == [
+        ('server.call', None), ('server.get_with_state', None),
+        ('server.setState', 3), ('server.get_with_state', 7)]
+
+
+def test_summarise():
+    records = [{'phase': 'clone', 'duration': float(d)}
+               for d in range(1, 101)]
+    records.append({'phase': 'solve', 'duration': 2.,
+                    'error': 'RuntimeError'})
+    records.append({'phase': 'solve', 'duration': 1., 'outcome': 'NewRun'})
+    summary = summarise(records)
+    assert list(summary) == ['clone', 'solve']
+    assert summary['clone']['count'] == 100
+    assert summary['clone']['errors'] == 0
+    assert summary['clone']['total'] == 5050.
+    assert summary['clone']['p50'] == pytest.approx(50.5)
+    assert summary['clone']['max'] == 100.
+    assert summary['solve']['errors'] == 1
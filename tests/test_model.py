@@ -1,8 +1,11 @@
 import pytest
 from pathlib import Path
+import f90nml
+import numpy
 from ModelOptimisation2.model import SimpleNamelistValue, RepeatedNamelistValue
-from ModelOptimisation2.model import InterpolatedValue
-from ModelOptimisation2.model import NamelistModel
+from ModelOptimisation2.model import InterpolatedValue, PiecewiseLinear
+from ModelOptimisation2.model import NamelistModel, NamelistTemplate
+from ModelOptimisation2.model import RestartFile
 
 NML1 = """&grp1
     p1 = {paramA}
@@ -101,6 +104,28 @@ def test_InterpolatedValue():
     assert v[1].value == 15
 
 
+def test_PiecewiseLinear():
+    x = [0, 21, 63]
+    y = [0, 20, 10]
+    interp = PiecewiseLinear(x, y)
+
+    values = numpy.linspace(0, 63, 50)
+    expected = numpy.interp(values, x, y)
+    assert numpy.allclose(interp(values), expected)
+    for v, e in zip(values, expected):
+        assert isinstance(interp(v), float)
+        assert interp(v) == pytest.approx(e)
+    assert interp(42) == 15
+    assert interp(63) == 10
+
+    for v in [-1, 64, [0, 64]]:
+        with pytest.raises(ValueError):
+            interp(v)
+
+    with pytest.raises(ValueError):
+        PiecewiseLinear([0, 2, 1], [0, 1, 2])
+
+
 def test_model_fail(rundir):
     model = ExampleModel(rundir)
 
@@ -131,3 +156,167 @@ def test_model(rundir):
     assert (rundir / 'test2.nml').read() == \
         NML2.format(
             paramD="-5.0")
+
+
+class InterpolatedModel(ExampleModel):
+    NAMELIST_MAP = dict(
+        ExampleModel.NAMELIST_MAP,
+        paramE=InterpolatedValue('test2.nml', 'grp2', 'p1', 'p2',
+                                 [0, 21, 63], [0, 20, 10]),
+        paramF=RepeatedNamelistValue('test2.nml', 'grp3', ['p1', 'p2']))
+
+
+def test_process_params_many(rundir):
+    model = InterpolatedModel(Path(rundir))
+
+    params_list = [{'paramA': 'hi world',
+                    'paramC': 10,
+                    'paramE': 42,
+                    'paramF': 1.5},
+                   {'paramA': 'hello',
+                    'paramC': 20,
+                    'paramE': 7.,
+                    'paramF': 2.5},
+                   {'paramD': -5.,
+                    'paramE': 63}]
+
+    assert model.process_params_many(params_list) == \
+        [model.process_params(p) for p in params_list]
+
+
+def test_process_params_many_fail(rundir):
+    model = InterpolatedModel(rundir)
+
+    with pytest.raises(LookupError):
+        model.process_params_many([{'paramA': 'hi'}, {'ZZ': 'fail'}])
+    with pytest.raises(ValueError):
+        model.process_params_many([{'paramE': 10}, {'paramE': 100}])
+
+
+def test_model_template(tmpdir_factory):
+    clone = Path(tmpdir_factory.mktemp("clone"))
+    model_setup(clone)
+    params = {'paramA': 'hi world',
+              'paramB': False,
+              'paramC': 10,
+              'paramD': -5.}
+
+    expected = Path(tmpdir_factory.mktemp("expected"))
+    model_setup(expected)
+    ExampleModel(expected).write_params(params)
+
+    for i in range(2):
+        rundir = Path(tmpdir_factory.mktemp("run"))
+        model_setup(rundir)
+        model = ExampleModel(rundir, clone=clone)
+        model.write_params(params)
+        for nml in ['test1.nml', 'test2.nml']:
+            assert (rundir / nml).read_text() == \
+                (expected / nml).read_text()
+
+
+def test_NamelistTemplate(tmpdir):
+    nmlname = Path(tmpdir, 'test.nml')
+    nmlname.write_text("""! a comment
+&grp1
+    p1 = 1, 2,  ! inline comment
+         3
+    p2 = 'hello', p3 = .true.
+/
+""")
+    template = NamelistTemplate(nmlname)
+
+    for patch in [{'grp1': {'p1': [4, 5, 6], 'p2': "it's"}},
+                  {'GRP1': {'P1': [4], 'p3': False}},
+                  {'grp1': {'p1': [1.5, 2.5]}}]:
+        output = Path(tmpdir, 'output.nml')
+        f90nml.patch(nmlname, patch, output)
+        assert template.patch(patch) == output.read_text()
+
+    # keys and groups not in the namelist cannot be spliced
+    assert template.patch({'grp1': {'p4': 1}}) is None
+    assert template.patch({'grp2': {'p1': 1}}) is None
+    # lists longer than the original value are not truncated
+    patch = {'grp1': {'p1': [1.5, 2.5, 3.5, 4.5]}}
+    assert template.grows(patch)
+    assert not template.grows({'grp1': {'p1': [1.5, 2.5, 3.5]}})
+    assert template.patch(patch) is None
+
+
+def test_model_list_grows(tmpdir_factory):
+    clone = Path(tmpdir_factory.mktemp("clone"))
+    model_setup(clone)
+    rundir = Path(tmpdir_factory.mktemp("run"))
+    model_setup(rundir)
+    ExampleModel(rundir, clone=clone).write_params(
+        {'paramC': [1, 2, 3], 'paramD': 2.})
+    nml = f90nml.read(rundir / 'test1.nml')
+    assert nml['grp2']['p1'] == [1, 2, 3]
+    assert nml['grp1']['p1'] == 'hello'
+    assert f90nml.read(rundir / 'test2.nml')['grp1']['p1'] == 2.
+
+
+@pytest.mark.parametrize('value,expected', [
+    (1.5, '1.5'), (3, '3'), (True, '.true.'), ('hello', "'hello'"),
+    ("it's", '"it\'s"')])
+def test_NamelistTemplate_format(value, expected):
+    assert NamelistTemplate.format(value) == expected
+
+
+def test_namelist_files():
+    assert InterpolatedModel.namelist_files() == [Path('test1.nml'),
+                                                  Path('test2.nml')]
+
+
+class RestartModel(ExampleModel):
+    RESTART_FILES = [RestartFile('restart/dump.*', 'test2.nml', 'grp1',
+                                 'restart'),
+                     RestartFile('ocean.restart')]
+
+
+def test_warm_start(tmpdir_factory):
+    source = Path(tmpdir_factory.mktemp("source"))
+    (source / 'restart').mkdir()
+    for i in range(1, 3):
+        (source / 'restart' / f'dump.{i:04d}').write_text(f'state {i}')
+
+    clone = Path(tmpdir_factory.mktemp("clone"))
+    model_setup(clone)
+    (clone / 'ocean.restart').write_text('initial state')
+    rundir = Path(tmpdir_factory.mktemp("run"))
+    model_setup(rundir)
+    (rundir / 'ocean.restart').symlink_to(clone / 'ocean.restart')
+
+    model = RestartModel(rundir, clone=clone)
+    model.write_params({'paramD': 2.})
+    assert model.warm_start(source) == [rundir / 'restart' / 'dump.0002']
+    assert (rundir / 'restart' / 'dump.0002').read_text() == 'state 2'
+    nml = f90nml.read(rundir / 'test2.nml')
+    assert nml['grp1']['p1'] == 2.
+    assert nml['grp1']['restart'] == 'restart/dump.0002'
+    # the backup still holds the original namelist
+    assert (rundir / 'test2.nml~').read_text() == \
+        (clone / 'test2.nml').read_text()
+    assert not (rundir / 'test2.nml.tmp').exists()
+
+    (source / 'ocean.restart').write_text('final state')
+    assert len(model.warm_start(source)) == 2
+    assert not (rundir / 'ocean.restart').is_symlink()
+    assert (rundir / 'ocean.restart').read_text() == 'final state'
+    assert (clone / 'ocean.restart').read_text() == 'initial state'
+
+
+def test_namelist_files_restart():
+    assert RestartModel.namelist_files() == [Path('test1.nml'),
+                                             Path('test2.nml')]
+    assert NamelistModel.RESTART_FILES == []
+
+
+@pytest.mark.parametrize('args', [
+    ('',),
+    ('dump.*', 'test2.nml'),
+    ('dump.*', 'test2.nml', 'grp1'),
+    ('dump.*', None, 'grp1', 'restart')])
+def test_RestartFile_fail(args):
+    with pytest.raises(ValueError):
+        RestartFile(*args)
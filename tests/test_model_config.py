@@ -0,0 +1,91 @@
+import pytest
+import sys
+import f90nml
+import ObjectiveFunction_client
+
+from ModelOptimisation2.config import ModelOptimisationConfig
+from ModelOptimisation2.config_dummy import DummyModel
+from ModelOptimisation2.model import RestartFile
+from ModelOptimisation2.model_config import claim_new_runs, configure_batch
+from ModelOptimisation2.model_config import configure, main
+
+LookupState = ObjectiveFunction_client.LookupState
+
+
+def params(i):
+    return {'ab': 0.1 * i, 'c': 0.5, 'de': 1., 'f': float(i)}
+
+
+@pytest.fixture
+def new_runs(server):
+    return [server.add_run(params(i)) for i in range(6)]
+
+
+def test_claim_new_runs(config, server, new_runs):
+    runs = claim_new_runs(config, 4)
+    assert sorted(runid for runid, p in runs) == new_runs[:4]
+    assert [server.states[r] for r in new_runs] == \
+        [LookupState.CONFIGURING] * 4 + [LookupState.NEW] * 2
+
+
+def test_configure_batch(config, clonedir, server, new_runs):
+    runs = claim_new_runs(config, 10)
+    modeldirs, failed = configure_batch(config, clonedir, 'copy', runs,
+                                        workers=3)
+    assert failed == []
+    assert modeldirs == [config.modelDir(r) for r in new_runs]
+    for runid in new_runs:
+        assert server.states[runid] == LookupState.CONFIGURED
+        nml = f90nml.read(config.modelDir(runid) / 'config.nml')
+        assert nml['polynomial']['f'] == pytest.approx(runid)
+        assert config.runParams(runid) == params(runid)
+
+
+def test_configure_batch_failure(config, clonedir, server, new_runs,
+                                 monkeypatch):
+    write_params = config.model.write_params
+
+    def failing(self, p):
+        if p['f'] == 2.:
+            raise RuntimeError('cannot write parameters')
+        return write_params(self, p)
+
+    monkeypatch.setattr(config.model, 'write_params', failing)
+    runs = claim_new_runs(config, 10)
+    modeldirs, failed = configure_batch(config, clonedir, 'copy', runs)
+    assert failed == [2]
+    assert len(modeldirs) == 5
+    assert server.states[2] == LookupState.NEW
+    # the partial model directory is removed so the run can be retried
+    assert not (config.basedir / 'run_0002').exists()
+    monkeypatch.setattr(config.model, 'write_params', write_params)
+    modeldirs, failed = configure_batch(config, clonedir, 'copy',
+                                        claim_new_runs(config, 10))
+    assert failed == []
+    assert modeldirs == [config.modelDir(2)]
+
+
+class RestartDummyModel(DummyModel):
+    # the dummy model reads its restart file by name
+    RESTART_FILES = [RestartFile('restart.nc')]
+
+
+def test_main_warm_start(config, config_file, clonedir, server, dummy_model,
+                         monkeypatch, capsys):
+    monkeypatch.setattr(ModelOptimisationConfig, 'model',
+                        property(lambda self: RestartDummyModel))
+    completed = server.add_run(params(1), state=LookupState.COMPLETED)
+    dummy_model(configure(config, clonedir, 'copy', completed, params(1)))
+    new = server.add_run(params(2))
+    monkeypatch.setattr(sys, 'argv', ['mo2-configure', str(config_file),
+                                      '--warm-start', '--batch', '5'])
+    main()
+    modeldir = config.modelDir(new)
+    assert capsys.readouterr().out.split() == [str(modeldir)]
+    assert server.states[new] == LookupState.CONFIGURED
+    assert (modeldir / 'restart.nc').read_bytes() == \
+        (config.modelDir(completed) / 'restart.nc').read_bytes()
+    nml = f90nml.read(modeldir / 'config.nml')
+    assert nml['polynomial']['f'] == pytest.approx(2.)
+    assert (modeldir / 'config.nml~').read_text() == \
+        (clonedir / 'config.nml').read_text()
@@ -0,0 +1,120 @@
+import pytest
+import sys
+import numpy
+import ObjectiveFunction_client
+
+from ModelOptimisation2.model_config import configure
+from ModelOptimisation2.monitor import cost, should_prune, prune_run, \
+    monitor, main
+from ModelOptimisation2.simobs_dummy import extract
+from ModelOptimisation2.transition import transition_run
+
+LookupState = ObjectiveFunction_client.LookupState
+
+
+def test_cost():
+    assert cost([1., 2., 3.], numpy.array([1., 0., 0.])) == 13.
+
+
+@pytest.mark.parametrize('partial_cost,keep,expected', [
+    (1., 0.5, False),
+    (3.5, 0.5, True),
+    (3.5, 0.9, False),
+    (0.5, 0., False),
+    (1.5, 0., True)])
+def test_should_prune(partial_cost, keep, expected):
+    completed = [1., 2., 3., 4., 5.]
+    assert should_prune(partial_cost, completed, keep=keep) == expected
+
+
+def test_should_prune_too_few_runs():
+    assert not should_prune(100., [1., 2.], min_runs=3)
+    assert should_prune(100., [1., 2.], min_runs=2)
+    assert not should_prune(100., [], min_runs=0)
+
+
+@pytest.fixture
+def active_runs(config, clonedir, server, dummy_model):
+    """two active runs of the dummy model and completed runs in the
+    cache whose cost lies between the costs of the active runs"""
+    runids = []
+    costs = []
+    for f in [0., 50.]:
+        params = {'ab': 0.1, 'c': 0., 'de': 0., 'f': f}
+        runid = server.add_run(params, state=LookupState.ACTIVE)
+        modeldir = configure(config, clonedir, 'copy', runid, params)
+        dummy_model(modeldir)
+        costs.append(cost(extract(modeldir / 'results.nc',
+                                  list(config.cfg['targets'])),
+                          config.targets))
+        runids.append(runid)
+    if costs[0] > costs[1]:
+        runids.reverse()
+    # each completed run has the mean cost of the active runs
+    residual = numpy.sqrt(numpy.mean(costs) / len(config.targets))
+    for i in range(5):
+        config.resultCache.set([i, 0., 0., 0.], config.targets + residual)
+    return runids
+
+
+def test_prune_run(config, server, active_runs):
+    cache = config.resultCache
+    good, bad = active_runs
+    assert prune_run(config, cache, bad, numpy.full(5, 1000.))
+    # no result is stored on the server
+    assert server.history[bad] == [LookupState.POSTPROCESSING]
+    assert bad not in server.results
+    assert (config.modelDir(bad) / config.PRUNED).exists()
+    assert config.resultStamp() is not None
+    x = server.params2values(config.runParams(bad))
+    assert numpy.array_equal(cache.penalty(x), numpy.full(5, 1000.))
+    # the penalty does not reach the cache
+    cache.set(x, numpy.full(5, 1000.))
+    assert len(cache) == 5
+    # the job of the pruned run cannot complete it
+    with pytest.raises(RuntimeError):
+        transition_run(config, bad, LookupState.ACTIVE, LookupState.RUN)
+
+
+def test_prune_run_completed(config, server, active_runs):
+    good, bad = active_runs
+    # the job completed the run first
+    transition_run(config, bad, LookupState.ACTIVE, LookupState.RUN)
+    assert not prune_run(config, config.resultCache, bad, numpy.zeros(5))
+    assert server.states[bad] == LookupState.RUN
+    assert not (config.modelDir(bad) / config.PRUNED).exists()
+    assert not config.resultCache.pruned(
+        server.params2values(config.runParams(bad)))
+
+
+def test_monitor(config, server, active_runs):
+    cache = config.resultCache
+    good, bad = active_runs
+    assert monitor(config, cache, 'results.nc', min_runs=6) == []
+    assert monitor(config, cache, 'results.nc') == [bad]
+    assert server.states[good] == LookupState.ACTIVE
+    assert server.states[bad] == LookupState.POSTPROCESSING
+    # the penalty is the partial output of the run
+    partial = extract(config.modelDir(bad) / 'results.nc',
+                      list(config.cfg['targets']))
+    x = server.params2values(config.runParams(bad))
+    assert numpy.allclose(cache.penalty(x), partial)
+    assert len(cache) == 5
+    assert server.results == {}
+    # pruned runs are not checked again
+    assert monitor(config, cache, 'results.nc') == []
+    assert server.history[bad] == [LookupState.POSTPROCESSING]
+
+
+def test_monitor_no_output(config, server, active_runs):
+    for runid in active_runs:
+        (config.modelDir(runid) / 'results.nc').unlink()
+    assert monitor(config, config.resultCache, 'results.nc') == []
+
+
+def test_main(config, config_file, server, active_runs, monkeypatch,
+              capsys):
+    monkeypatch.setattr(sys, 'argv', ['mo2-monitor', str(config_file)])
+    main()
+    assert capsys.readouterr().out.split() == [
+        str(config.modelDir(active_runs[1]))]
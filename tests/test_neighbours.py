@@ -0,0 +1,28 @@
+import pytest
+
+from ModelOptimisation2.neighbours import NeighbourIndex
+
+
+@pytest.mark.parametrize('rebuild', [1, 3, 100])
+def test_nearest(rebuild):
+    index = NeighbourIndex([0., -10.], [1., 10.], 1e-3, rebuild=rebuild)
+    assert index.nearest([0.5, 0.]) is None
+    for i, x in enumerate([[0.5, 0.], [0.5, 1.], [0.2, 0.], [0.5, 0.01]]):
+        index.add(x, i)
+    assert len(index) == 4
+
+    distance, value = index.nearest([0.5, 0.])
+    assert distance == 0.
+    assert value == 0
+    # the distance is relative to the bounds
+    distance, value = index.nearest([0.5, 0.015])
+    assert distance == pytest.approx(0.00025)
+    assert value == 3
+    assert index.nearest([0.5005, 0.015])[1] == 3
+    assert index.nearest([0.502, 0.]) is None
+    assert index.nearest([0.5, 0.03]) is None
+
+
+def test_negative_tolerance():
+    with pytest.raises(ValueError):
+        NeighbourIndex([0.], [1.], -1.)
@@ -0,0 +1,189 @@
+import pytest
+import sys
+import threading
+import time
+import numpy
+import dfols
+import ObjectiveFunction_client
+
+from ModelOptimisation2.checkpoint import Checkpoint
+from ModelOptimisation2.model_config import configure
+from ModelOptimisation2.optimise import initial_design, load_checkpoint, \
+    CommandLauncher, wait_for_result, run_daemon, residual, load_surrogate, \
+    lookup_cached, start_point, main, CHECKPOINT, START, RHOBEG
+from ModelOptimisation2.simobs_dummy import extract
+
+LookupState = ObjectiveFunction_client.LookupState
+COMPLETED = LookupState.COMPLETED
+
+
+class Stop(Exception):
+    pass
+
+
+@pytest.mark.parametrize('x0', [[0.5, -0.25, 5., 60.],
+                                [1., -1., 9.5, 0.]])
+def test_initial_design(x0):
+    lower = numpy.array([-1., -1., -10., -100.])
+    upper = numpy.array([1., 1., 10., 100.])
+    x0 = numpy.array(x0)
+    evaluated = []
+
+    def objfun(x):
+        evaluated.append(x.copy())
+        if len(evaluated) > len(x0):
+            raise Stop
+        return numpy.array([numpy.sum(x ** 2), x[0]])
+
+    with pytest.raises(Stop):
+        dfols.solve(objfun, x0.copy(), bounds=(lower, upper),
+                    rhobeg=RHOBEG, scaling_within_bounds=True)
+
+    design = initial_design(x0, lower, upper)
+    assert design.shape == (len(x0) + 1, len(x0))
+    assert numpy.array_equal(design, evaluated[:len(x0) + 1])
+
+
+def test_load_checkpoint(config, server):
+    x = numpy.array([0.1, 0., 0., 0.])
+    obs = numpy.arange(5.)
+    Checkpoint(config.basedir / CHECKPOINT).record(x, obs)
+    runid = server.add_run(server.values2params(x), state=COMPLETED)
+    server.results[runid] = obs
+    cache = config.resultCache
+    cache.set(x, obs)
+
+    assert len(load_checkpoint(config, cache=cache)) == 1
+    assert len(load_checkpoint(config)) == 1
+    # verifying the checkpoint does not create runs
+    assert len(server.runs) == 1
+
+    # only the last evaluation matches the cache
+    checkpoint = Checkpoint(config.basedir / CHECKPOINT)
+    checkpoint.clear()
+    checkpoint.record(x, obs + 1)
+    checkpoint.record(x, obs)
+    assert len(load_checkpoint(config, cache=cache)) == 0
+
+
+def test_load_checkpoint_reset(config, server):
+    Checkpoint(config.basedir / CHECKPOINT).record([0.1, 0., 0., 0.],
+                                                   numpy.arange(5.))
+    # the server has no completed runs
+    assert len(load_checkpoint(config)) == 0
+    assert len(server.runs) == 0
+
+
+def test_command_launcher(tmp_path):
+    cfg = tmp_path / 'my config;.cfg'
+    launcher = CommandLauncher(f'echo {{config}} > {tmp_path}/out', cfg)
+    launcher()
+    launcher.wait()
+    assert launcher.running == 0
+    assert (tmp_path / 'out').read_text().strip() == str(cfg)
+
+
+def test_command_launcher_failure(tmp_path):
+    launcher = CommandLauncher('exit 3', tmp_path / 'modelopt.cfg')
+    launcher()
+    with pytest.raises(RuntimeError, match='status 3'):
+        launcher.wait()
+    assert launcher.running == 0
+
+
+def test_main_daemon_needs_launch(config_file, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['mo2-optimise', str(config_file),
+                                      '--daemon'])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 2
+
+
+def test_wait_for_result(config):
+    start = time.monotonic()
+    assert not wait_for_result(config, 0.2)
+    assert time.monotonic() - start >= 0.2
+
+    timer = threading.Timer(0.1, config.notifyResult)
+    timer.start()
+    assert wait_for_result(config, 10.)
+    assert time.monotonic() - start < 5.
+    timer.join()
+
+
+@pytest.fixture
+def launcher(config, clonedir, server, dummy_model):
+    """configure, run and postprocess a new run in the foreground"""
+    def launch():
+        runid, params = server.get_with_state(
+            LookupState.NEW, with_id=True,
+            new_state=LookupState.CONFIGURING)
+        modeldir = configure(config, clonedir, 'copy', runid, params)
+        dummy_model(modeldir)
+        for state in [LookupState.CONFIGURED, LookupState.ACTIVE,
+                      LookupState.RUN, LookupState.POSTPROCESSING]:
+            server.setState(runid, state)
+        server.set_result(params, extract(modeldir / 'results.nc',
+                                          list(config.cfg['targets'])))
+        config.notifyResult()
+    return launch
+
+
+def test_run_daemon(config, server, launcher):
+    soln = run_daemon(config, launcher, poll=0.1)
+    assert soln.flag == soln.EXIT_SUCCESS
+    # each evaluation of the optimiser was run once
+    assert len(server.results) == soln.nf
+    assert set(server.states.values()) == {COMPLETED}
+
+
+def test_run_daemon_timeout(config, server):
+    with pytest.raises(TimeoutError):
+        run_daemon(config, lambda: None, poll=0.01, timeout=0.1)
+    assert list(server.states.values()) == [LookupState.NEW]
+
+
+def test_run_daemon_surrogate(config, server, launcher):
+    cache = config.resultCache
+    baseline = run_daemon(config, launcher, poll=0.1, cache=cache)
+    # train the emulator on the first optimisation and start afresh
+    x0 = start_point(config, load_surrogate(config, cache, 0.))
+    assert (config.basedir / START).exists()
+    checkpoint = Checkpoint(config.basedir / CHECKPOINT)
+    soln = run_daemon(config, launcher, poll=0.1, checkpoint=checkpoint,
+                      cache=cache, x0=x0)
+    assert soln.flag == soln.EXIT_SUCCESS
+    assert soln.obj <= baseline.obj * (1. + 1e-9)
+    # the optimiser only saw results of model runs
+    assert checkpoint.verify(lambda x: lookup_cached(cache, x))
+    assert len(cache) == len(server.results)
+    # the optimiser is replayed from the stored start point
+    assert numpy.array_equal(start_point(config), x0)
+
+
+def test_start_point(config, server):
+    x0 = start_point(config, load_surrogate(config, config.resultCache, 0.))
+    # too few completed runs to train the emulator
+    assert numpy.array_equal(x0, config.objectiveFunction.params2values(
+        config.values, include_constant=False))
+    assert not (config.basedir / START).exists()
+
+
+def test_residual_pruned(config, server):
+    cache = config.resultCache
+    checkpoint = Checkpoint(config.basedir / CHECKPOINT)
+    x = numpy.array([0.1, 0., 0., 0.])
+    runid = server.add_run(server.values2params(x),
+                           state=LookupState.POSTPROCESSING)
+    # the run was pruned by mo2-monitor and has no result on the server
+    cache.prune(x, numpy.full(5, 500.))
+    r = residual(config, x, checkpoint=checkpoint, cache=cache)
+    assert numpy.array_equal(r, numpy.full(5, 500.) - config.targets)
+    assert len(cache) == 0
+    assert runid not in server.results
+    assert server.states[runid] == LookupState.POSTPROCESSING
+    # the penalty is consistent with the checkpoint
+    assert numpy.array_equal(lookup_cached(cache, x), numpy.full(5, 500.))
+    # runs are only pruned once others have completed
+    server.add_run(server.values2params(x + 0.1), state=COMPLETED)
+    assert len(load_checkpoint(config, cache=cache)) == 1
@@ -0,0 +1,50 @@
+import pytest
+import ObjectiveFunction_client
+
+from ModelOptimisation2.pipeline import Pipeline
+from ModelOptimisation2.simobs_dummy import extract
+
+LookupState = ObjectiveFunction_client.LookupState
+
+CHAIN = [LookupState.CONFIGURED, LookupState.ACTIVE, LookupState.RUN,
+         LookupState.POSTPROCESSING, LookupState.COMPLETED]
+
+
+def extract_dummy(modeldir, names):
+    return extract(modeldir / 'results.nc', names)
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_pipeline(config, server, dummy_model, batch):
+    pipeline = Pipeline(config, dummy_model, extract_dummy, workers=4)
+    soln = pipeline.run(batch=batch)
+    assert soln.flag == soln.EXIT_SUCCESS
+    assert pipeline.pending == 0
+    assert len(server.results) == len(server.runs)
+    for runid in server.runs:
+        assert server.history[runid] == CHAIN
+        assert (config.modelDir(runid) / 'results.nc').exists()
+
+
+def test_pipeline_retry(config, server, dummy_model):
+    failed = set()
+
+    def flaky_model(modeldir):
+        # every run fails the first time
+        if modeldir not in failed:
+            failed.add(modeldir)
+            raise RuntimeError('model crashed')
+        dummy_model(modeldir)
+
+    soln = Pipeline(config, flaky_model, extract_dummy).run()
+    assert soln.flag == soln.EXIT_SUCCESS
+    assert len(failed) == len(server.runs)
+    assert set(server.states.values()) == {LookupState.COMPLETED}
+
+
+def test_pipeline_gives_up(config, server):
+    def broken_model(modeldir):
+        raise RuntimeError('model crashed')
+
+    with pytest.raises(RuntimeError, match='failed 3 times'):
+        Pipeline(config, broken_model, extract_dummy, retries=2).run()
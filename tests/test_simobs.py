@@ -0,0 +1,45 @@
+import pytest
+from pathlib import Path
+import numpy
+import xarray
+
+from ModelOptimisation2.simobs import SimObsExtractor
+
+COORDS = {'sim0': [0.1, 0.1],
+          'sim1': [0.1, 0.5],
+          'sim2': [0.1, 0.9],
+          'sim3': [0.5, 0.1],
+          'sim4': [0.5, 0.9]}
+
+
+@pytest.fixture
+def data_file(tmpdir):
+    x = numpy.linspace(-2., 3., 41)
+    y = numpy.geomspace(1., 50., 23)
+    z = numpy.add.outer(y ** 2, 10 * x)
+    res = Path(tmpdir, 'results.nc')
+    xarray.Dataset({'z': (('y', 'x'), z)},
+                   coords={'x': x, 'y': y}).to_netcdf(res)
+    return res
+
+
+def test_extract(data_file):
+    extractor = SimObsExtractor(COORDS)
+    names = ['sim4', 'sim0', 'sim2']
+
+    simobs = extractor.extract(data_file, names)
+    assert list(simobs.index) == names
+
+    with xarray.open_dataset(data_file) as data:
+        for obs in names:
+            x, y = COORDS[obs]
+            x = float(data.x[0]) + float(data.x[-1] - data.x[0]) * x
+            y = float(data.y[0]) + float(data.y[-1] - data.y[0]) * y
+            z = float(data.z.sel(x=x, y=y, method='nearest'))
+            assert simobs[obs] == z
+
+        # indices are reused for the same grid
+        indices = extractor.indices(data.x.values, data.y.values, names)
+        assert extractor.extract_dataset(data, names).equals(simobs)
+        assert extractor.indices(data.x.values, data.y.values,
+                                 names) is indices
@@ -0,0 +1,61 @@
+import pytest
+import sys
+import ObjectiveFunction_client
+
+from ModelOptimisation2.simobs_dummy import claim_runs, postprocess_all, \
+    main
+
+LookupState = ObjectiveFunction_client.LookupState
+
+
+@pytest.fixture
+def finished_runs(config, server, dummy_model):
+    runids = []
+    for i in range(4):
+        runid = server.add_run({'ab': 0.1 * i, 'c': 0., 'de': 0., 'f': 1.},
+                               state=LookupState.RUN)
+        modeldir = config.modelDir(runid, create=True)
+        (modeldir / 'config.nml').write_text(
+            (config.cloneDir / 'config.nml').read_text())
+        dummy_model(modeldir)
+        runids.append(runid)
+    # a run without output
+    runids.append(server.add_run({'ab': 1., 'c': 0., 'de': 0., 'f': 1.},
+                                 state=LookupState.RUN))
+    config.modelDir(runids[-1], create=True)
+    return runids
+
+
+def test_claim_runs(config, server, finished_runs):
+    server.setState(finished_runs[0], LookupState.ACTIVE)
+    runs = claim_runs(config)
+    assert sorted(runid for runid, params in runs) == finished_runs[1:]
+    assert server.states[finished_runs[0]] == LookupState.ACTIVE
+    for runid in finished_runs[1:]:
+        assert server.states[runid] == LookupState.POSTPROCESSING
+
+
+def test_postprocess_all(config, server, finished_runs):
+    failed = postprocess_all(config, claim_runs(config), workers=2)
+    assert failed == [finished_runs[-1]]
+    for runid in finished_runs[:-1]:
+        assert server.states[runid] == LookupState.COMPLETED
+        assert len(server.results[runid]) == len(config.cfg['targets'])
+    # the failed run can be postprocessed again
+    assert server.states[finished_runs[-1]] == LookupState.RUN
+    assert config.resultStamp() is not None
+
+
+def test_main_all(config_file, server, finished_runs, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['mo2-simobs_dummy', str(config_file),
+                                      '--all'])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    assert [server.states[r] for r in finished_runs] == \
+        [LookupState.COMPLETED] * 4 + [LookupState.RUN]
+
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    assert server.states[finished_runs[-1]] == LookupState.RUN
@@ -0,0 +1,106 @@
+import pytest
+import numpy
+
+from ModelOptimisation2.surrogate import GaussianProcess, Surrogate
+from ModelOptimisation2.cache import ResultCache
+
+
+def model(x):
+    return numpy.array([numpy.sin(3 * x[0]) + x[1], x[0] * x[1]])
+
+
+@pytest.fixture
+def points():
+    rng = numpy.random.default_rng(1)
+    return rng.random((30, 2))
+
+
+def test_gp_interpolates(points):
+    gp = GaussianProcess([0., 0.], [1., 1.])
+    for x in points:
+        gp.add(x, model(x))
+    mean, std = gp.predict(points[3])
+    assert mean == pytest.approx(model(points[3]), abs=1e-4)
+    assert numpy.all(std < 1e-3)
+
+
+def test_gp_predicts(points):
+    gp = GaussianProcess([0., 0.], [1., 1.])
+    for x in points:
+        gp.add(x, model(x))
+    x = numpy.array([0.4, 0.6])
+    mean, std = gp.predict(x)
+    assert mean == pytest.approx(model(x), abs=0.01)
+    assert numpy.all(std < 0.05)
+
+
+def test_gp_too_few_points():
+    gp = GaussianProcess([0., 0.], [1., 1.])
+    gp.add([0.5, 0.5], [1., 1.])
+    with pytest.raises(RuntimeError):
+        gp.predict([0.2, 0.2])
+
+
+def test_gp_predict_batch(points):
+    gp = GaussianProcess([0., 0.], [1., 1.])
+    for x in points[:10]:
+        gp.add(x, model(x))
+    mean, std = gp.predict(points[10:])
+    assert mean.shape == std.shape == (20, 2)
+    for i, x in enumerate(points[10:]):
+        m, s = gp.predict(x)
+        assert numpy.allclose(mean[i], m)
+        assert numpy.allclose(std[i], s)
+
+
+def test_propose_too_few_points():
+    surrogate = Surrogate([0., 0.], [1., 1.], [1., 0.5])
+    for x in [[0., 0.], [1., 1.]]:
+        surrogate.add(x, model(x))
+    assert len(surrogate) == 2
+    assert surrogate.propose() is None
+
+
+def test_propose(points):
+    targets = model([0.3, 0.6])
+    surrogate = Surrogate([0., 0.], [1., 1.], targets)
+    for x in points:
+        surrogate.add(x, model(x))
+    x = surrogate.propose()
+    # better than all training points
+    assert surrogate.cost(model(x)) < min(
+        surrogate.cost(model(p)) for p in points)
+    # the proposal is reproducible
+    assert numpy.array_equal(surrogate.propose(), x)
+
+
+def test_propose_optimistic():
+    surrogate = Surrogate([0., 0.], [10., 10.], [1., 0.5], kappa=3.)
+    for x in [[0., 0.], [0., 1.], [1., 0.], [1., 1.], [0.5, 0.5]]:
+        surrogate.add(x, model(x))
+    x = surrogate.propose()
+    assert numpy.all(x >= 0.) and numpy.all(x <= 10.)
+
+
+def test_propose_fit_fails(points, monkeypatch):
+    surrogate = Surrogate([0., 0.], [1., 1.], [1., 0.5])
+    for x in points:
+        surrogate.add(x, model(x))
+
+    def fit(self):
+        raise RuntimeError('could not fit emulator')
+
+    monkeypatch.setattr(GaussianProcess, 'fit', fit)
+    assert surrogate.propose() is None
+
+
+def test_from_cache(tmp_path, points):
+    cache = ResultCache(tmp_path / 'cache.sqlite')
+    for x in points[:10]:
+        cache.set(x, model(x))
+    surrogate = Surrogate.from_cache(cache, [0., 0.], [1., 1.], [1., 0.5])
+    assert len(surrogate) == 10
+    # points already trained with are not added again
+    for x, obs in cache.items():
+        surrogate.add(x, obs)
+    assert len(surrogate) == 10
@@ -0,0 +1,106 @@
+import pytest
+import argparse
+import sys
+import ObjectiveFunction_client
+
+from ModelOptimisation2.instrument import load_records, PROFILE_ENV
+from ModelOptimisation2.transition import parse_ids, transition_runs, \
+    claim_runs, main
+
+LookupState = ObjectiveFunction_client.LookupState
+
+
+@pytest.mark.parametrize('spec,expected', [
+    ('3', [3]),
+    ('1-4', [1, 2, 3, 4]),
+    ('7,1-3,2', [1, 2, 3, 7]),
+    ('5-5', [5])])
+def test_parse_ids(spec, expected):
+    assert parse_ids(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['', 'a', '1-', '4-2', '1,,2', '1-2-3'])
+def test_parse_ids_fail(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_ids(spec)
+
+
+def make_runs(config, server, states):
+    runids = []
+    for i, state in enumerate(states):
+        runid = server.add_run({'ab': 0.1 * i, 'c': 0., 'de': 0., 'f': 0.},
+                               state=state)
+        config.modelDir(runid, create=True)
+        runids.append(runid)
+    return runids
+
+
+def test_transition_runs(config, server):
+    runids = make_runs(config, server, [LookupState.RUN] * 10)
+    moved, problems = transition_runs(config, runids, LookupState.RUN,
+                                      LookupState.POSTPROCESSING)
+    assert moved == runids
+    assert problems == []
+    assert all(server.states[r] == LookupState.POSTPROCESSING
+               for r in runids)
+
+
+def test_transition_runs_wrong_state(config, server):
+    runids = make_runs(config, server, [LookupState.RUN, LookupState.ACTIVE,
+                                        LookupState.RUN])
+    moved, problems = transition_runs(config, runids + [99], LookupState.RUN,
+                                      LookupState.POSTPROCESSING)
+    assert moved == [runids[0], runids[2]]
+    assert len(problems) == 2
+    assert server.states[runids[1]] == LookupState.ACTIVE
+
+
+def test_claim_runs(config, server):
+    states = [LookupState.CONFIGURED] * 5 + [LookupState.NEW]
+    make_runs(config, server, states)
+    assert claim_runs(config, LookupState.CONFIGURED, LookupState.ACTIVE,
+                      num_runs=3) == [0, 1, 2]
+    assert claim_runs(config, LookupState.CONFIGURED,
+                      LookupState.ACTIVE) == [3, 4]
+    assert server.states[5] == LookupState.NEW
+
+
+def test_main_ids(config, config_file, server, monkeypatch, capsys):
+    runids = make_runs(config, server, [LookupState.RUN, LookupState.ACTIVE])
+    monkeypatch.setattr(sys, 'argv', ['mo2-transition', str(config_file),
+                                      'RUN', 'POSTPROCESSING', '-I', '0-1'])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 1
+    assert capsys.readouterr().out.split() == [
+        str(config.modelDir(runids[0]))]
+    assert server.states[runids[0]] == LookupState.POSTPROCESSING
+    assert server.states[runids[1]] == LookupState.ACTIVE
+
+
+def test_main_profile(config, config_file, server, monkeypatch, capsys):
+    runids = make_runs(config, server, [LookupState.CONFIGURED] * 3)
+    monkeypatch.setenv(PROFILE_ENV, '1')
+    monkeypatch.setattr(sys, 'argv', ['mo2-transition', str(config_file),
+                                      'CONFIGURED', 'ACTIVE', '-i', '1'])
+    main()
+    monkeypatch.setattr(sys, 'argv', ['mo2-transition', str(config_file),
+                                      'CONFIGURED', 'ACTIVE', '--all'])
+    main()
+    assert server.states[runids[2]] == LookupState.ACTIVE
+    records = list(load_records(config.instrument.directory))
+    phases = [(r['phase'], r['runid']) for r in records]
+    assert ('transition', 1) in phases
+    assert ('transition', None) in phases
+
+
+def test_main_pruned(config, config_file, server, monkeypatch):
+    runid, = make_runs(config, server, [LookupState.ACTIVE])
+    (config.modelDir(runid) / config.PRUNED).touch()
+    monkeypatch.chdir(config.modelDir(runid))
+    monkeypatch.setattr(sys, 'argv', ['mo2-transition', str(config_file),
+                                      'ACTIVE', 'RUN', '-i'])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 2
+    assert server.states[runid] == LookupState.ACTIVE
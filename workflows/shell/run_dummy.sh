@@ -28,12 +28,27 @@ fi
 # get configured run
 MODELDIR=$(mo2-transition $CFG CONFIGURED ACTIVE) || exit 1
 
-# run it
+# run it, stopping the model if the run is pruned by mo2-monitor
 pushd $MODELDIR
-$DUMMY config.nml results.nc || exit 1
-
-# mark it as completed
-mo2-transition $CFG ACTIVE RUN -i || exit 1
+$DUMMY config.nml results.nc &
+MODEL=$!
+while kill -0 $MODEL 2> /dev/null; do
+    if [ -e objfun.pruned ]; then
+        # the optimiser gets the penalty of a pruned run from mo2-monitor
+        kill $MODEL
+        wait $MODEL
+        popd
+        exit 0
+    fi
+    sleep ${PRUNE_POLL:-1}
+done
+wait $MODEL || exit 1
+
+# mark it as completed unless it was pruned while finishing
+if ! mo2-transition $CFG ACTIVE RUN -i; then
+    [ -e objfun.pruned ] && exit 0
+    exit 1
+fi
 popd
 
 $RUN_POSTPROCESSING $CFG